@@ -0,0 +1,245 @@
+"""
+Dispatch throughput and latency benchmarks.
+
+Each run builds a fresh bus with synthetic senders and collectors:
+
+    root sender --s0--> stage 0 --s1--> ... stage depth-1 --t0..tN--> collectors
+
+The root sender emits one event per root (straight onto the tags when depth is 0). Each terminal collector takes
+`fan_in` of the tags, and every one of them completes once per root. The payload is the time the root was emitted,
+so terminal collectors can record end-to-end latency.
+
+Starting from a baseline, one dimension is varied at a time, and every result is written to JSON:
+
+    python benchmarks/bench_dispatch.py -o results.json
+    python benchmarks/bench_dispatch.py -o new.json --baseline results.json
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+VARIANTS = ("async", "sync", "asyncgen", "gen")
+
+BASELINE: Dict[str, Any] = {
+    "module": "asynchronise",
+    "mode": "default",
+    "collectors": 10,
+    "tags": 4,
+    "fan_in": 1,
+    "depth": 0,
+    "sender": "asyncgen",
+    "variant": "async",
+}
+
+SWEEPS: Dict[str, List[Any]] = {
+    "collectors": [1, 10, 50, 200],
+    "tags": [1, 4, 16],
+    "fan_in": [1, 2, 4],
+    "depth": [0, 4, 16],
+    "sender": list(VARIANTS),
+    "variant": list(VARIANTS),
+    "mode": ["default", "eager"],
+    "module": ["asynchronise", "asynchronise_2"],
+}
+
+
+def load_bus(module: str, eager: bool):
+    if module == "asynchronise_2":
+        from asynchronise.asynchronise_2 import Asynchronise
+    else:
+        from asynchronise.asynchronise import Asynchronise
+    return Asynchronise(eager=eager)
+
+
+# Collector functions get their argument names from __signature__, which is what both modules read.
+def make_function(
+    name: str, variant: str, arguments: List[str], body: Callable[[Dict[str, Any]], List[Any]]
+) -> Callable:
+    if variant == "async":
+
+        async def func(**kwargs):
+            out = body(kwargs)
+            return out[0] if out else None
+
+    elif variant == "sync":
+
+        def func(**kwargs):
+            out = body(kwargs)
+            return out[0] if out else None
+
+    elif variant == "asyncgen":
+
+        async def func(**kwargs):
+            for obj in body(kwargs):
+                yield obj
+
+    else:
+
+        def func(**kwargs):
+            for obj in body(kwargs):
+                yield obj
+
+    func.__name__ = func.__qualname__ = name
+    func.__signature__ = inspect.Signature(
+        [inspect.Parameter(a, inspect.Parameter.KEYWORD_ONLY) for a in arguments]
+    )
+    return func
+
+
+def register(bus: Any, module: str, func: Callable, arguments: List[str], sends: bool) -> None:
+    if module == "asynchronise_2":
+        bus.collect()(func)
+    else:
+        bus.collect({a: (None, a, None) for a in arguments})(func)
+    if sends:
+        bus.send(func)
+
+
+# Function variants can only return once, so they emit a single event carrying every tag.
+def fan_out(variant: str, value: float, tags: List[str]) -> List[Any]:
+    if variant in ("async", "sync"):
+        return [(value, *tags)]
+    return [(value, tag) for tag in tags]
+
+
+def events_per_root(config: Dict[str, Any]) -> int:
+    depth, tags = config["depth"], config["tags"]
+    last = config["variant"] if depth else config["sender"]
+    return depth + (1 if last in ("async", "sync") else tags)
+
+
+async def run_once(config: Dict[str, Any], roots: int) -> Dict[str, Any]:
+    module, depth, variant = config["module"], config["depth"], config["variant"]
+    bus = load_bus(module, config["mode"] == "eager")
+    tags = [f"t{i}" for i in range(config["tags"])]
+    fan_in = min(config["fan_in"], len(tags))
+    latencies: List[float] = []
+
+    for k in range(depth):
+        if k == depth - 1:
+            body = lambda kwargs: fan_out(variant, next(iter(kwargs.values())), tags)
+        else:
+            body = lambda kwargs, k=k: [(next(iter(kwargs.values())), f"s{k + 1}")]
+        register(bus, module, make_function(f"stage{k}", variant, [f"s{k}"], body), [f"s{k}"], True)
+
+    def record(kwargs: Dict[str, Any]) -> List[Any]:
+        latencies.append(time.perf_counter() - next(iter(kwargs.values())))
+        return []
+
+    for i in range(config["collectors"]):
+        arguments = [tags[(i + j) % len(tags)] for j in range(fan_in)]
+        register(bus, module, make_function(f"collector{i}", variant, arguments, record), arguments, False)
+
+    first = ["s0"] if depth else tags
+    root_body = lambda kwargs: fan_out(config["sender"], time.perf_counter(), first)
+    root = bus.send(make_function("root", config["sender"], [], root_body))
+
+    started = time.perf_counter()
+    for _ in range(roots):
+        if inspect.isasyncgenfunction(root):
+            async for _ in root():
+                pass
+        else:
+            await root()
+    await bus.drain()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    completions = roots * (depth + config["collectors"])
+
+    def percentile(q: float) -> Optional[float]:
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    return {
+        **config,
+        "roots": roots,
+        "elapsed": elapsed,
+        "events_per_sec": roots * events_per_root(config) / elapsed,
+        "completions_per_sec": completions / elapsed,
+        "completed": len(latencies),
+        "latency_p50": percentile(0.5),
+        "latency_p99": percentile(0.99),
+    }
+
+
+def configurations(only: Optional[List[str]]) -> List[Dict[str, Any]]:
+    configs = [dict(BASELINE)]
+    for dimension, values in SWEEPS.items():
+        if only and dimension not in only:
+            continue
+        for value in values:
+            config = dict(BASELINE, **{dimension: value})
+            if config not in configs:
+                configs.append(config)
+    return configs
+
+
+def key(config: Dict[str, Any]) -> str:
+    return ",".join(f"{k}={config[k]}" for k in BASELINE)
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        previous = {key(r): r for r in json.load(f)["results"] if "events_per_sec" in r}
+    for result in results:
+        before = previous.get(key(result))
+        if before is None or "events_per_sec" not in result:
+            continue
+        ratio = result["events_per_sec"] / before["events_per_sec"]
+        flag = "  REGRESSION" if ratio < 0.9 else ""
+        print(f"{key(result)}: {ratio:.2f}x events/sec{flag}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--roots", type=int, default=500, help="root events per run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per configuration; the fastest is kept")
+    parser.add_argument("--only", nargs="*", choices=list(SWEEPS), help="only sweep these dimensions")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for config in configurations(args.only):
+        try:
+            runs = [asyncio.run(run_once(config, args.roots)) for _ in range(args.repeat)]
+        except ImportError as e:
+            results.append({**config, "skipped": str(e)})
+            print(f"{key(config)}: skipped ({e})")
+            continue
+        best = max(runs, key=lambda r: r["events_per_sec"])
+        results.append(best)
+        print(
+            f"{key(config)}: {best['events_per_sec']:.0f} events/s, "
+            f"p50 {best['latency_p50'] or 0:.6f}s, p99 {best['latency_p99'] or 0:.6f}s"
+        )
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "timestamp": time.time(),
+                "roots": args.roots,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -49,6 +49,6 @@ async def run():
         if i > 5:
             break
         pass
-    await asyncio.sleep(2)
+    await asyncer.drain()
 
 asyncio.run(run())
\ No newline at end of file
@@ -1,3 +1,4 @@
+import abc
 import asyncio
 #from loguru import logger
 
@@ -17,23 +18,54 @@ from typing import (
     Union,
     Tuple,
     Hashable,
+    Iterable,
+    FrozenSet,
+    Deque,
 )
 from uuid import uuid4
-from threading import Lock
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import threading
+
+from .metrics import Metrics
+from .transport import PayloadArena, SharedPayload, call_with_payloads
+from .eventlog import EventLog
+from .caching import MemoryCache, cache_key
+from .scheduling import Scheduler
+from .graph import PipelineGraph, build_graph
+from .channels import Subscription
+from .tracing import Tracer, current_span
+import time
+
+_no_tags: FrozenSet[Hashable] = frozenset()
+_tag_sets: Dict[Hashable, FrozenSet[Hashable]] = {}
+
+
+# Most events carry a single tag, so those share one frozenset per tag instead of building a new one each time.
+def single_tag(tag: Hashable) -> FrozenSet[Hashable]:
+    try:
+        return _tag_sets[tag]
+    except KeyError:
+        pass
+    tags = frozenset((tag,))
+    if len(_tag_sets) < 4096:
+        _tag_sets[tag] = tags
+    return tags
+
 
 class Event:
-    def __init__(self, data: Any, uuid: str):
+    __slots__ = ("data", "uuid", "tag")
+
+    def __init__(self, data: Any, uuid: str, tag: Iterable[Hashable] = _no_tags):
         self.data = data
         self.uuid = uuid
-        self._lock = Lock()
-        self.tag = set()
+        self.tag: FrozenSet[Hashable] = tag if isinstance(tag, frozenset) else frozenset(tag)
 
-    # Ideally, we'd like to be able to call methods on and get attributes from the data as if it were the data itself, so we can override getattr and setattr.
+    # Ideally, we'd like to be able to call methods on and get attributes from the data as if it were the data itself. This only runs once normal lookup on the event has failed, so it can go straight to the data.
     def __getattr__(self, name: str) -> Any:
-        if name not in self.__dict__:
-            #with self._lock:
-            return self.__getattribute__("data").__getattribute__(name)
-        return self.__getattribute__(name)
+        if name in Event.__slots__ or name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.data, name)
 
     # And a convenience function for getting the type of the data
     def istype(self, cls: Type) -> bool:
@@ -48,7 +80,10 @@ from collections import namedtuple
 Conditions = namedtuple("Conditions", ["type", "tag", "predicate"])
 
 
-class UniqueCollection:
+class CollectorPlan:
+    # Everything about a collector that doesn't change between uuids, worked out once when it's collected.
+    __slots__ = ("func", "names", "conditions")
+
     def __init__(
         self,
         func: Callable,
@@ -60,35 +95,157 @@ class UniqueCollection:
                 Optional[Callable[[Event], bool]],
             ],
         ],
-        uuid: str,
     ) -> None:
         self.func = func
-        self.keyword_lambdas = {k: Conditions(*v) for k, v in keyword_lambdas.items()}
-        self.collection: Dict[str, Any] = {k: None for k in keyword_lambdas.keys()}
+        self.names: Tuple[str, ...] = tuple(keyword_lambdas)
+        # isinstance wants a tuple rather than a list of types.
+        self.conditions: Tuple[Conditions, ...] = tuple(
+            Conditions(tuple(type_) if isinstance(type_, list) else type_, tag, predicate)
+            for type_, tag, predicate in keyword_lambdas.values()
+        )
+
+    def accepts(self, i: int, obj: Event) -> bool:
+        condition = self.conditions[i]
+        return (
+            (condition.tag is None or condition.tag in obj.tag)
+            and (condition.type is None or isinstance(obj.data, condition.type))
+            and (condition.predicate is None or condition.predicate(obj))
+        )
+
+
+class UniqueCollection:
+    # The per-uuid state: one value per argument, in the plan's order, plus the positions still waiting for one.
+    __slots__ = ("plan", "uuid", "values", "empty_slots", "touched", "created")
+
+    def __init__(self, plan: CollectorPlan, uuid: str) -> None:
+        self.plan = plan
         self.uuid = uuid
-        self.empty_slots = set(self.collection.keys())
-
-    async def check_object(self, obj: Event) -> Optional[Dict[str, Any]]:
-        to_remove = set()
-        for k in self.empty_slots:
-            condition = self.keyword_lambdas[k]
-            if (
-                (condition.type is None or isinstance(obj.data, condition.type))
-                and (condition.tag is None or condition.tag in obj.tag)
-                and (condition.predicate is None or condition.predicate(obj))
-            ):
-                self.collection[k] = obj.data
-                to_remove.add(k)
-                #print("Added to collection:", k)
+        self.values: List[Any] = [None] * len(plan.names)
+        self.empty_slots: List[int] = list(range(len(plan.names)))
+        self.touched = 0.0
+        self.created = 0.0
+
+    @property
+    def collection(self) -> Dict[str, Any]:
+        return dict(zip(self.plan.names, self.values))
+
+    def check_object(self, obj: Event) -> Optional[Dict[str, Any]]:
+        accepts = self.plan.accepts
+        remaining = []
+        for i in self.empty_slots:
+            if accepts(i, obj):
+                self.values[i] = obj.data
+                #print("Added to collection:", self.plan.names[i])
             else:
-                pass
-                #print("Not added to collection:", k, type(obj.data), obj.data)
-        self.empty_slots -= to_remove
-        if len(self.empty_slots) == 0:
+                remaining.append(i)
+        self.empty_slots = remaining
+        if not remaining:
             return self.collection
 
 
+class Window:
+    # How long a value stays joinable: for the last `count` events with its join key, and/or for `seconds` after it arrived. Sliding windows move along with every event; tumbling ones cut each key's stream into back-to-back windows and only join values that landed in the same one.
+    __slots__ = ("count", "seconds", "tumbling")
+
+    def __init__(
+        self, count: Optional[int] = None, seconds: Optional[float] = None, tumbling: bool = False
+    ) -> None:
+        if count is None and seconds is None:
+            raise ValueError("A window needs a count, a length in seconds, or both")
+        self.count = count
+        self.seconds = seconds
+        self.tumbling = tumbling
+
+    def __repr__(self) -> str:
+        kind = "tumbling" if self.tumbling else "sliding"
+        return f"<{self.__class__.__name__} {kind} count={self.count} seconds={self.seconds}>"
+
+
+def sliding(count: Optional[int] = None, seconds: Optional[float] = None) -> Window:
+    return Window(count, seconds)
+
+
+def tumbling(count: Optional[int] = None, seconds: Optional[float] = None) -> Window:
+    return Window(count, seconds, tumbling=True)
+
+
+# A bare int is a sliding window over that many events, a float one over that many seconds.
+def as_window(window: Union[None, int, float, Window]) -> Optional[Window]:
+    if window is None or isinstance(window, Window):
+        return window
+    if isinstance(window, int):
+        return Window(count=window)
+    return Window(seconds=window)
+
+
+class JoinState:
+    # The per-key state of a join: the latest value each argument received, which of the key's events it arrived as, and when. Joining only ever looks at these, so it costs the same however long the window is.
+    __slots__ = ("plan", "key", "values", "seen", "at", "events", "opened", "touched")
+
+    def __init__(self, plan: CollectorPlan, key: Hashable) -> None:
+        self.plan = plan
+        self.key = key
+        self.values: List[Any] = [None] * len(plan.names)
+        self.seen: List[int] = [-1] * len(plan.names)
+        self.at: List[float] = [0.0] * len(plan.names)
+        self.events = 0
+        self.opened = 0.0
+        self.touched = 0.0
+
+    @property
+    def collection(self) -> Dict[str, Any]:
+        return {k: v for k, v, seen in zip(self.plan.names, self.values, self.seen) if seen >= 0}
+
+    def add(
+        self, positions: List[int], data: Any, now: float, window: Optional[Window]
+    ) -> Optional[Dict[str, Any]]:
+        if window is not None and window.tumbling and self.events:
+            if (window.count is not None and self.events >= window.count) or (
+                window.seconds is not None and now - self.opened >= window.seconds
+            ):
+                self.seen = [-1] * len(self.seen)
+                self.events = 0
+        if not self.events:
+            self.opened = now
+        for i in positions:
+            self.values[i] = data
+            self.seen[i] = self.events
+            self.at[i] = now
+        self.events += 1
+        for i, seen in enumerate(self.seen):
+            if seen < 0:
+                return None
+            if window is not None and not window.tumbling:
+                if window.count is not None and self.events - seen > window.count:
+                    return None
+                if window.seconds is not None and now - self.at[i] > window.seconds:
+                    return None
+        return dict(zip(self.plan.names, self.values))
+
+
+class Latest:
+    # A conflated completion that is waiting for the one ahead of it to finish. Newer matches overwrite it, and the placeholder keeps its uuid in flight meanwhile.
+    __slots__ = ("kwargs", "uuid", "placeholder")
+
+    def __init__(self) -> None:
+        self.kwargs: Optional[Dict[str, Any]] = None
+        self.uuid: Optional[str] = None
+        self.placeholder: Optional[asyncio.Future] = None
+
+
+class Held:
+    # The newest event for one debounced argument, and the timer that lets it through once things go quiet.
+    __slots__ = ("event", "timer", "placeholder")
+
+    def __init__(self, event: Event, timer: asyncio.TimerHandle, placeholder: asyncio.Future) -> None:
+        self.event = event
+        self.timer = timer
+        self.placeholder = placeholder
+
+
 class FunctionSlot:
+    plan_class: Type[CollectorPlan] = CollectorPlan
+
     def __init__(
         self,
         func: Callable,
@@ -100,28 +257,215 @@ class FunctionSlot:
                 Optional[Callable[[Event], bool]],
             ],
         ],
+        max_age: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        on_expire: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+        plan_options: Optional[Dict[str, Any]] = None,
+        max_concurrency: Optional[int] = None,
+        executor: Union[None, str, Executor] = None,
+        batch_size: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        join_key: Optional[Callable[[Event], Hashable]] = None,
+        window: Union[None, int, float, Window] = None,
+        cache: Any = None,
+        priority: Optional[int] = None,
+        deadline: Optional[float] = None,
+        fallback: Optional[Callable] = None,
+        conflate: Union[bool, Callable[[Dict[str, Any]], Hashable]] = False,
+        debounce: Optional[Dict[str, float]] = None,
     ) -> None:
         self.func = func
         self.keyword_lambdas = keyword_lambdas
-        self.collection_slots: Dict[str, UniqueCollection] = {}
+        self.plan = self.plan_class(func, keyword_lambdas, **(plan_options or {}))
+        # Ordered least recently touched first, so both eviction policies only ever look at the front.
+        self.collection_slots: "OrderedDict[str, UniqueCollection]" = OrderedDict()
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.on_expire = on_expire
+        self.evicted = 0
+        self.max_concurrency = max_concurrency
+        self.executor = executor
+        self._limiter: Optional[asyncio.Semaphore] = None
+        # Batch collectors are called with lists: one entry per completed collection, for every argument.
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.batch: List[Dict[str, Any]] = []
+        self.batch_timer: Optional[asyncio.TimerHandle] = None
+        # Joins collect across uuids: collection_slots is keyed by join_key(event) instead, and each key keeps the latest value of every argument for as long as the window allows.
+        self.join_key = join_key
+        self.window = as_window(window)
+        # Once all of a key's values are older than a time window it can never join again, so without a max_age of its own that's when it's dropped.
+        if join_key is not None and self.max_age is None and self.window is not None and self.window.seconds is not None:
+            self.max_age = self.window.seconds
+        self.joined = 0
+        # For pure collectors: outputs by cache_key of the arguments, and the calls already computing a key so identical ones wait for them instead.
+        self.cache = MemoryCache() if cache is True else (cache or None)
+        self.computing: Dict[str, asyncio.Future] = {}
+        # How long the collection that last completed spent waiting for its final argument.
+        self.waited = 0.0
+        # Completions of collectors with a priority or deadline queue in the bus's Scheduler instead of starting straight away. A deadline is in seconds from the match; work still queued past it runs `fallback` (with the same arguments) instead, or nothing.
+        self.priority = priority
+        self.deadline = deadline
+        self.fallback = fallback
+        # Latest-value mode: while a completion runs, at most one more waits per key (the uuid, or conflate(kwargs)), and newer matches replace it rather than queueing behind it.
+        self.conflate = conflate
+        self.latest: Dict[Hashable, Latest] = {}
+        # Arguments whose events are held back until that many seconds pass without a newer one, per uuid (or join key).
+        self.debounce = debounce or {}
+        self.held: Dict[Tuple[Hashable, str], Held] = {}
+
+    @property
+    def scheduled(self) -> bool:
+        return self.priority is not None or self.deadline is not None
 
-    async def match_object(self, obj: Event):
-        if obj.uuid not in self.collection_slots.keys():
+    @property
+    def batching(self) -> bool:
+        return self.batch_size is not None or self.max_wait is not None
+
+    def take_batch(self) -> Dict[str, List[Any]]:
+        batch, self.batch = self.batch, []
+        if self.batch_timer is not None:
+            self.batch_timer.cancel()
+            self.batch_timer = None
+        return {k: [kwargs[k] for kwargs in batch] for k in self.plan.names}
+
+    # Made on first use so that it belongs to the running loop.
+    def limiter(self) -> asyncio.Semaphore:
+        if self._limiter is None:
+            self._limiter = asyncio.Semaphore(self.max_concurrency)
+        return self._limiter
+
+    # The tags and types an event needs for this slot to possibly accept it. A condition with neither can match anything, so the slot has to see every event.
+    def dispatch_keys(self) -> Tuple[Set[Hashable], Set[Type], bool]:
+        tags: Set[Hashable] = set()
+        types: Set[Type] = set()
+        wildcard = False
+        for condition in self.plan.conditions:
+            if condition.tag is not None:
+                tags.add(condition.tag)
+            elif condition.type is not None:
+                if isinstance(condition.type, (tuple, list)):
+                    types.update(condition.type)
+                else:
+                    types.add(condition.type)
+            else:
+                wildcard = True
+        return tags, types, wildcard
+
+    def new_collection(self, uuid: str) -> UniqueCollection:
+        return UniqueCollection(self.plan, uuid)
+
+    def match_object(self, obj: Event):
+        now = time.monotonic()
+        if self.max_age is not None:
+            self.expire(now)
+        if self.join_key is not None:
+            return self.match_join(obj, now)
+        collection = self.collection_slots.get(obj.uuid)
+        if collection is None:
             #print("Creating new collection")
-            self.collection_slots[obj.uuid] = UniqueCollection(
-                self.func, self.keyword_lambdas, obj.uuid
-            )
-        collection = self.collection_slots[obj.uuid]
-        result = await collection.check_object(obj)
+            collection = self.collection_slots[obj.uuid] = self.new_collection(obj.uuid)
+            collection.created = now
+            if self.max_entries is not None:
+                while len(self.collection_slots) > self.max_entries:
+                    self.evict(*self.collection_slots.popitem(last=False))
+        else:
+            self.collection_slots.move_to_end(obj.uuid)
+        collection.touched = now
+        result = collection.check_object(obj)
         if result is not None:
             #print("Returning result")
             del self.collection_slots[obj.uuid]
+            self.waited = now - collection.created
+            return (self.func, result)
+
+    # Each accepted event replaces its arguments' values for its key, and completes whenever every argument has a value still inside the window.
+    def match_join(self, obj: Event, now: float):
+        accepts = self.plan.accepts
+        positions = [i for i in range(len(self.plan.names)) if accepts(i, obj)]
+        if not positions:
+            return None
+        key = self.join_key(obj)
+        if key is None:
+            return None
+        self.joined += 1
+        state = self.collection_slots.get(key)
+        if state is None:
+            state = self.collection_slots[key] = JoinState(self.plan, key)
+            if self.max_entries is not None:
+                while len(self.collection_slots) > self.max_entries:
+                    self.evict(*self.collection_slots.popitem(last=False))
+        else:
+            self.collection_slots.move_to_end(key)
+        state.touched = now
+        result = state.add(positions, obj.data, now, self.window)
+        if result is not None:
+            self.waited = 0.0
             return (self.func, result)
 
+    # Drops partial collections that haven't received an argument for max_age seconds.
+    def expire(self, now: Optional[float] = None) -> None:
+        if self.max_age is None:
+            return
+        if now is None:
+            now = time.monotonic()
+        while self.collection_slots:
+            uuid, collection = next(iter(self.collection_slots.items()))
+            if now - collection.touched <= self.max_age:
+                break
+            del self.collection_slots[uuid]
+            self.evict(uuid, collection)
+
+    def evict(self, uuid: Hashable, collection: Union[UniqueCollection, JoinState]) -> None:
+        self.evicted += 1
+        if self.on_expire is not None:
+            self.on_expire(uuid, collection.collection)
+
 
+import importlib
 import inspect
 
 
+# Module level so process pools can pickle it. Only the run time is measured in the worker; queueing is whatever else the round trip took.
+def timed_call(call: Callable[[], Any]) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    obj = call()
+    return obj, time.perf_counter() - started
+
+
+_named: Dict[Tuple[str, str], Callable] = {}
+
+
+# Also runs in the worker: finds a function by where it was defined, looking through the @send wrapper now bound to that name (pickle would find the wrapper and refuse the original).
+def call_named(module: str, qualname: str, /, **kwargs: Any) -> Any:
+    func = _named.get((module, qualname))
+    if func is None:
+        obj: Any = importlib.import_module(module)
+        for part in qualname.split("."):
+            obj = getattr(obj, part)
+        func = _named[module, qualname] = inspect.unwrap(
+            obj, stop=lambda f: not getattr(f, "_asynchronise_sender", False)
+        )
+    return func(**kwargs)
+
+
+# What a process pool gets sent in place of func: a reference by name when there is one to go by.
+def by_name(func: Callable) -> Callable:
+    module = getattr(func, "__module__", None)
+    qualname = getattr(func, "__qualname__", "")
+    if module is None or "<locals>" in qualname or not inspect.isfunction(func):
+        return func
+    return functools.partial(call_named, module, qualname)
+
+
+def make_event(obj: Any, uu: str) -> Event:
+    if isinstance(obj, tuple):
+        if len(obj) == 2:
+            return Event(obj[0], uu, single_tag(obj[1]))
+        return Event(obj[0], uu, frozenset(obj[1:]))
+    return Event(obj, uu)
+
+
 def get_uuid(*args, **kwargs):
     uus = [x.uuid for x in args if isinstance(x, Event)] + [
         v.uuid for k, v in kwargs.items() if isinstance(v, Event)
@@ -134,38 +478,250 @@ def get_uuid(*args, **kwargs):
         uu = uuid4().hex
     return uu
 
+def set_signature(func1: Callable, func2: Callable):
+    func1.__name__ = func2.__name__
+    func1.__doc__ = func2.__doc__
+    func1.__annotations__ = func2.__annotations__
+    func1.__kwdefaults__ = func2.__kwdefaults__
+    func1.__defaults__ = func2.__defaults__
+    return func1
+
+
+# Whether isinstance(data, type_) can be answered from type(data) alone, with issubclass. Not for runtime-checkable Protocols (issubclass refuses those with data members, and isinstance looks at the instance's attributes) or anything else with its own __instancecheck__; ABCMeta's is fine, since it only defers to __subclasscheck__.
+def indexable_type(type_: Type) -> bool:
+    check = getattr(type(type_), "__instancecheck__", None)
+    if check is not type.__instancecheck__ and check is not abc.ABCMeta.__instancecheck__:
+        return False
+    try:
+        issubclass(object, type_)
+    except TypeError:
+        return False
+    return True
+
+
+class DispatchIndex:
+    # Maps tags and data types to the slots that could accept an event carrying them, so an event only visits its subscribers rather than every registered function.
+    def __init__(self) -> None:
+        self.by_tag: Dict[Hashable, List[FunctionSlot]] = {}
+        self.by_type: List[Tuple[Type, FunctionSlot]] = []
+        self.wildcard: List[FunctionSlot] = []
+        self._type_cache: Dict[Type, List[FunctionSlot]] = {}
+
+    def rebuild(self, slots: Iterable[FunctionSlot]) -> None:
+        self.by_tag = {}
+        self.by_type = []
+        self.wildcard = []
+        self._type_cache = {}
+        for slot in slots:
+            tags, types, wildcard = slot.dispatch_keys()
+            # Types the index can't check go through the slot's own isinstance checks instead, like any other wildcard.
+            if wildcard or not all(map(indexable_type, types)):
+                self.wildcard.append(slot)
+                continue
+            for tag in tags:
+                self.by_tag.setdefault(tag, []).append(slot)
+            for type_ in types:
+                self.by_type.append((type_, slot))
+
+    def for_type(self, cls: Type) -> List[FunctionSlot]:
+        # issubclass walks the MRO (and honours ABC registration), and the answer only depends on the class, so it's worked out once per class.
+        try:
+            return self._type_cache[cls]
+        except KeyError:
+            pass
+        slots = [slot for type_, slot in self.by_type if issubclass(cls, type_)]
+        self._type_cache[cls] = slots
+        return slots
+
+    def candidates(self, event: Event) -> List[FunctionSlot]:
+        found: Dict[FunctionSlot, None] = dict.fromkeys(self.wildcard)
+        for tag in event.tag:
+            for slot in self.by_tag.get(tag, ()):
+                found[slot] = None
+        if self.by_type:
+            for slot in self.for_type(type(event.data)):
+                found[slot] = None
+        return list(found)
+
+
+# Runs a blocking iterator in `executor` (the loop's default one if None) and hands its items back to the loop as they're produced. It runs at most `buffer` items ahead of the consumer, and hands its thread back whenever it gets there, picking up again (maybe on another thread) once the consumer takes one; so a slow consumer never holds a worker, and a pool full of stalled generators can't starve whoever they're waiting on. It stops at the next item once the consumer goes away.
+async def iterate_in_thread(
+    iterator: Iterable, executor: Optional[Executor] = None, buffer: int = 4
+) -> AsyncGenerator[Any, None]:
+    loop = asyncio.get_running_loop()
+    items: asyncio.Queue = asyncio.Queue()
+    lock = threading.Lock()
+    finished = object()
+    # How many more items the producer may put before the consumer takes some, whether a produce() is submitted or running, and whether the consumer has gone.
+    room = buffer
+    running = True
+    stopped = False
+
+    def put(item: Any, error: Optional[BaseException] = None) -> None:
+        nonlocal stopped
+        try:
+            loop.call_soon_threadsafe(items.put_nowait, (item, error))
+        except RuntimeError:
+            # The loop has closed underneath us.
+            stopped = True
+
+    def produce() -> None:
+        nonlocal room, running
+        try:
+            while True:
+                with lock:
+                    if stopped:
+                        break
+                    if not room:
+                        running = False
+                        return
+                    room -= 1
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    put(finished)
+                    break
+                put(item)
+        except BaseException as e:
+            put(finished, e)
+        # Done, one way or another; `running` stays set so nothing submits this again.
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+    def resume() -> None:
+        nonlocal running
+        with lock:
+            if running:
+                return
+            running = True
+        try:
+            loop.run_in_executor(executor, produce)
+        except RuntimeError:
+            # The executor or the loop is shutting down.
+            pass
+
+    iterator = iter(iterator)
+    loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            item, error = await items.get()
+            if item is finished:
+                if error is not None:
+                    raise error
+                return
+            with lock:
+                room += 1
+            resume()
+            yield item
+    finally:
+        with lock:
+            stopped = True
+        # Gets a parked producer to close the iterator.
+        resume()
+
+
 import random
 import ast
 
 class Asynchronise:
-    def __init__(self, name: Optional[str] = None) -> None:
+    slot_class: Type[FunctionSlot] = FunctionSlot
+
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        max_age: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        on_expire: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+        max_in_flight: Optional[int] = None,
+        eager: bool = False,
+        max_depth: int = 32,
+        metrics: bool = False,
+        on_metric: Optional[Callable[[str, Hashable, float], Any]] = None,
+        transport: Optional[PayloadArena] = None,
+        log: Optional[EventLog] = None,
+        workers: Union[int, Dict[int, int]] = 16,
+        tracer: Optional[Tracer] = None,
+        default_workers: int = 16,
+        generator_threads: int = 32,
+    ) -> None:
         self.functions: Dict[str, FunctionSlot] = {}
+        self.index = DispatchIndex()
+        # Defaults for collectors that don't set their own eviction policy.
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.on_expire = on_expire
+        # Every task the bus starts is kept here until it finishes, otherwise the event loop only holds weak references to them. With max_in_flight set, senders wait on yield while the bus is this busy. It's a throttle on senders, not a hard cap: the tasks an admitted event spawns (matching, completions, what collectors emit) never wait, so the count can overshoot by one event's fan-out.
+        self.max_in_flight = max_in_flight
+        self._tasks: Set[asyncio.Future] = set()
+        self._room_waiters: Deque[asyncio.Future] = deque()
+        self._uuid_tasks: Dict[str, Set[asyncio.Future]] = {}
+        # In eager mode events are matched inside whoever emitted them, and async collectors are awaited there too rather than each hop getting its own tasks. Chains deeper than max_depth carry on in a fresh task.
+        self.eager = eager
+        self.max_depth = max_depth
+        # Workers per priority class, for collectors with a priority or deadline.
+        self.scheduler = Scheduler(self, workers, default_workers)
+        # Executors collectors can refer to by name, as in collect(executor="io").
+        self.executors: Dict[str, Executor] = {}
+        # Where sync generators run, senders and collectors alike, unless a collector names an executor of its own. Kept apart from the default pool that sync collectors share; started on first use.
+        self.generator_threads = generator_threads
+        self._generator_executor: Optional[ThreadPoolExecutor] = None
+        # With a PayloadArena, large buffers bound for process pools go through shared memory instead of being pickled. An event's data is placed once, when any of its candidates runs in a process pool, and every completion it reaches retains that one segment; the event's own reference goes once nothing is running under its uuid any more. _placed maps id(data) to its segment for as long as that reference is held, which also keeps data alive and its id from being reused.
+        self.transport = transport
+        self._placed: Dict[int, SharedPayload] = {}
+        self._uuid_payloads: Dict[str, List[Tuple[int, SharedPayload]]] = {}
+        # Only collected when asked for; every hook checks for None first so it costs next to nothing otherwise.
+        self.metrics: Optional[Metrics] = (
+            Metrics(on_metric) if metrics or on_metric is not None else None
+        )
+        # Records spans for a sample of uuids; see tracing.py.
+        self.tracer = tracer
+        # Every event the bus creates is appended here before it's matched; replay() reads them back.
+        self.log = log
+        # Called with every event the bus creates, before it's matched.
+        self.listeners: List[Callable[[Event], Any]] = []
+        self.subscriptions: List[Subscription] = []
         self.senders: Set[str] = set()
+        # What compile() knows about the pipeline: the tags senders declared, and names claimed by more than one function.
+        self.emits: Dict[str, FrozenSet[Hashable]] = {}
+        self.sender_functions: Dict[str, Callable] = {}
+        self.collisions: List[str] = []
+        # Set by compile(): events nobody subscribes to aren't created at all.
+        self.elide = False
         self.name = (
             name
             if name
             else "".join(list(map(lambda x: chr(random.randint(97, 122)), range(10))))
         )
 
-    def send(self, func: Callable) -> Callable:
+    # Also usable as send(emits=[...]), declaring the tags the function emits for compile().
+    def send(self, func: Optional[Callable] = None, emits: Optional[Iterable[Hashable]] = None) -> Callable:
+        if func is None:
+            return functools.partial(self.send, emits=emits)
+        previous = self.sender_functions.get(func.__name__)
+        if previous is not None and previous is not func:
+            self.collisions.append(func.__name__)
+        self.sender_functions[func.__name__] = func
         self.senders.add(func.__name__)
+        if emits is not None:
+            self.emits[func.__name__] = frozenset(emits)
 
         async def async_generator_decorator(*args, **kwargs) -> Any:
             uu = get_uuid(*args, **kwargs)
             async for obj in func(*args, **kwargs):
-                asyncio.create_task(self.create_event(obj, uu))
+                await self.emit(obj, uu, func.__name__)
                 yield obj
 
         async def sync_generator_decorator(*args, **kwargs) -> Any:
             uu = get_uuid(*args, **kwargs)
-            for obj in func(*args, **kwargs):
-                asyncio.create_task(self.create_event(obj, uu))
+            async for obj in iterate_in_thread(func(*args, **kwargs), self.generator_executor):
+                await self.emit(obj, uu, func.__name__)
                 yield obj
 
         async def async_function_decorator(*args, **kwargs) -> Any:
             uu = get_uuid(*args, **kwargs)
             obj = await func(*args, **kwargs)
-            asyncio.create_task(self.create_event(obj, uu))
+            await self.emit(obj, uu, func.__name__)
             return obj
 
         async def sync_function_decorator(*args, **kwargs) -> Any:
@@ -174,71 +730,607 @@ class Asynchronise:
             obj = await loop.run_in_executor(
                 None, functools.partial(func, *args, **kwargs)
             )
-            asyncio.create_task(self.create_event(obj, uu))
+            await self.emit(obj, uu, func.__name__)
             return obj
 
+        def wrap(wrapper: Callable) -> Callable:
+            set_signature(wrapper, func)
+            wrapper.__wrapped__ = func
+            wrapper._asynchronise_sender = True
+            return wrapper
+
         if inspect.isasyncgenfunction(func):
             #logger.debug(f"Wrapping {func.__name__} as an async generator")
-            async_generator_decorator.__name__ = func.__name__
-            async_generator_decorator.__doc__ = func.__doc__
-            return async_generator_decorator
+            return wrap(async_generator_decorator)
         elif inspect.iscoroutinefunction(func):
             #logger.debug(f"Wrapping {func.__name__} as a coroutine")
-            async_function_decorator.__name__ = func.__name__
-            async_function_decorator.__doc__ = func.__doc__
-            return async_function_decorator
+            return wrap(async_function_decorator)
         elif inspect.isgeneratorfunction(func):
             #logger.debug(f"Wrapping {func.__name__} as a generator")
-            sync_generator_decorator.__name__ = func.__name__
-            sync_generator_decorator.__doc__ = func.__doc__
-            return sync_generator_decorator
+            return wrap(sync_generator_decorator)
         else:
             #logger.debug(f"Wrapping {func.__name__} as a function")
-            sync_function_decorator.__name__ = func.__name__
-            sync_function_decorator.__doc__ = func.__doc__
-            return sync_function_decorator
+            return wrap(sync_function_decorator)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def spawn(self, coro: Coroutine, uu: Optional[str] = None) -> asyncio.Task:
+        return self.track(asyncio.create_task(coro), uu)
+
+    # Counts a task (or any future standing in for pending work) as in flight, and as working on uu, until it's done.
+    def track(self, task: asyncio.Future, uu: Optional[str] = None) -> asyncio.Future:
+        self._tasks.add(task)
+        if uu is not None:
+            self._uuid_tasks.setdefault(uu, set()).add(task)
+        task.add_done_callback(functools.partial(self._task_done, uu))
+        return task
+
+    def _task_done(self, uu: Optional[str], task: asyncio.Future) -> None:
+        self._tasks.discard(task)
+        if uu is not None:
+            tasks = self._uuid_tasks.get(uu)
+            if tasks is not None:
+                tasks.discard(task)
+                if not tasks:
+                    del self._uuid_tasks[uu]
+                    if uu in self._uuid_payloads:
+                        self.release_payloads(uu)
+        if self.max_in_flight is not None:
+            while self._room_waiters and len(self._tasks) < self.max_in_flight:
+                waiter = self._room_waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    break
 
-    async def create_event(self, obj: Any, uu: str):
+    # Waits until every task the bus started (or, given a uuid, every task working on that uuid) has finished, including the ones started along the way. A full drain also flushes partial batches rather than waiting out their max_wait.
+    async def drain(self, uuid: Optional[str] = None) -> None:
+        current = asyncio.current_task()
+        while True:
+            if uuid is None:
+                tasks = set(self._tasks)
+            else:
+                tasks = set(self._uuid_tasks.get(uuid, ()))
+            tasks.discard(current)
+            if tasks:
+                await asyncio.wait(tasks)
+            elif uuid is None and any(s.batch for s in self.functions.values()):
+                self.flush_batches()
+            else:
+                return
+
+    async def __aenter__(self) -> "Asynchronise":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.drain()
+        if self.log is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.log.wait)
+
+    # Used where a sender yields: suspends the sender until the bus has room for another event.
+    async def emit(self, obj: Any, uu: str, sender: Optional[str] = None) -> None:
+        if self.metrics is not None:
+            self.metrics.count("sent", sender)
+        if self.elide and self.is_dead(obj):
+            return
+        if self.subscriptions:
+            await self.wait_for_subscribers(obj)
+        if self.max_in_flight is not None:
+            await self.wait_for_room()
+        if self.eager:
+            await self.dispatch(obj, uu, 0, sender)
+        else:
+            self.spawn(self.create_event(obj, uu, sender), uu)
+
+    # Whether nothing could possibly receive an event made from obj: no collector subscribes to its tags, and nothing else (listeners, the log, collectors matching on type or on anything) wants to see it.
+    def is_dead(self, obj: Any) -> bool:
+        index = self.index
+        if self.listeners or self.log is not None or index.wildcard or index.by_type:
+            return False
         if isinstance(obj, tuple):
-            event = Event(obj[0], uu)
+            by_tag = index.by_tag
             for tag in obj[1:]:
-                event.tag.add(tag)
+                if tag in by_tag:
+                    return False
+        if self.metrics is not None:
+            self.metrics.count("elided", obj[1] if isinstance(obj, tuple) and len(obj) == 2 else None)
+        return True
+
+    # Waits while a subscription with overflow="block" that would receive obj is full.
+    async def wait_for_subscribers(self, obj: Any) -> None:
+        for subscription in self.subscriptions:
+            if subscription.overflow == "block" and subscription.full and subscription.wants(obj):
+                await subscription.room()
+
+    async def wait_for_room(self) -> None:
+        while len(self._tasks) >= self.max_in_flight:
+            waiter = asyncio.get_running_loop().create_future()
+            self._room_waiters.append(waiter)
+            await waiter
+
+    # Used for what collectors yield or return. Never waits for room, since it runs inside tasks that count towards max_in_flight.
+    async def publish(
+        self, obj: Any, uu: str, depth: int = 0, sender: Optional[str] = None
+    ) -> None:
+        if self.metrics is not None:
+            self.metrics.count("sent", sender)
+        if self.elide and self.is_dead(obj):
+            return
+        if self.subscriptions:
+            await self.wait_for_subscribers(obj)
+        if self.eager:
+            await self.dispatch(obj, uu, depth, sender)
         else:
-            event = Event(obj, uu)
-        [
-            asyncio.create_task(self.check_for_match(func_slot, event, uu))
-            for func_slot in self.functions.values()
-        ]
+            self.spawn(self.create_event(obj, uu, sender), uu)
+
+    async def create_event(self, obj: Any, uu: str, sender: Optional[str] = None):
+        event = make_event(obj, uu)
+        if self.tracer is not None and self.tracer.sampled(uu):
+            # Set in this task's own context, so the check_for_match tasks below inherit it.
+            current_span.set(self.tracer.event(uu, event.tag, sender))
+        if self.log is not None:
+            self.log.append(uu, tuple(event.tag), event.data)
+        if self.metrics is not None:
+            self.count_event(event)
+        if self.listeners:
+            for listener in self.listeners:
+                listener(event)
+        candidates = self.index.candidates(event)
+        if self.transport is not None:
+            self.place(event, candidates)
+        for func_slot in candidates:
+            self.spawn(self.check_for_match(func_slot, event, uu), uu)
+
+    # The eager counterpart of create_event and check_for_match.
+    async def dispatch(self, obj: Any, uu: str, depth: int = 0, sender: Optional[str] = None) -> None:
+        event = make_event(obj, uu)
+        token = None
+        if self.tracer is not None and self.tracer.sampled(uu):
+            # Dispatching happens in the emitter's own context, so the span is only current until it's done.
+            token = current_span.set(self.tracer.event(uu, event.tag, sender))
+        try:
+            if self.log is not None:
+                self.log.append(uu, tuple(event.tag), event.data)
+            if self.metrics is not None:
+                self.count_event(event)
+            if self.listeners:
+                for listener in self.listeners:
+                    listener(event)
+            candidates = self.index.candidates(event)
+            if self.transport is not None:
+                self.place(event, candidates)
+            for func_slot in candidates:
+                # A failing collector, predicate or on_expire shouldn't take down whoever emitted the event, or keep it from the other slots, just as it wouldn't if each slot ran in its own task.
+                try:
+                    if func_slot.debounce and self.hold(func_slot, event):
+                        continue
+                    res = self.match(func_slot, event)
+                    if not res:
+                        continue
+                    func, kwargs = res
+                    if func_slot.batching:
+                        self.add_to_batch(func_slot, kwargs)
+                    elif func_slot.scheduled or func_slot.conflate:
+                        self.complete(func, kwargs, uu, func_slot)
+                    elif depth < self.max_depth and self.runs_on_loop(func, func_slot):
+                        await self.schedule_completion(func, kwargs, uu, func_slot, depth + 1)
+                    else:
+                        self.spawn(self.schedule_completion(func, kwargs, uu, func_slot), uu)
+                except Exception as e:
+                    self.collector_failed(func_slot.func, e)
+        finally:
+            if token is not None:
+                current_span.reset(token)
+            if uu in self._uuid_payloads and uu not in self._uuid_tasks:
+                self.release_payloads(uu)
+
+    def place(self, event: Event, candidates: List[FunctionSlot]) -> None:
+        for func_slot in candidates:
+            executor = func_slot.executor
+            if isinstance(executor, str):
+                executor = self.executors.get(executor)
+            if isinstance(executor, ProcessPoolExecutor):
+                break
+        else:
+            return
+        # Placed afresh for every event, even if the same buffer was placed before: it may have been refilled since.
+        handle = self.transport.put(event.data)
+        if isinstance(handle, SharedPayload):
+            self._placed[id(event.data)] = handle
+            self._uuid_payloads.setdefault(event.uuid, []).append((id(event.data), handle))
+
+    def release_payloads(self, uu: str) -> None:
+        for key, handle in self._uuid_payloads.pop(uu):
+            if self._placed.get(key) is handle:
+                del self._placed[key]
+            self.transport.release(handle)
+
+    # The process-pool form of a completion's arguments: the segments their events were placed in, retained for this completion, and anything else put on its own.
+    def share_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        transport = self.transport
+        shared = {}
+        for k, v in kwargs.items():
+            handle = self._placed.get(id(v))
+            if handle is not None and handle.name in transport.segments:
+                transport.retain(handle)
+                shared[k] = handle
+            else:
+                shared[k] = transport.put(v)
+        return shared
+
+    # Streams a log's events back through the bus without logging them again. Events are matched inline rather than getting a task each. `collectors` (names) limits who sees them. With run=False they only rebuild partial collections: a collection they'd complete was already completed before, so it's dropped rather than run again. That's how a restarted bus picks up where the last one stopped. Returns how many events were replayed.
+    async def replay(
+        self,
+        log: EventLog,
+        start: int = 0,
+        collectors: Optional[Iterable[str]] = None,
+        run: bool = True,
+    ) -> int:
+        names = None if collectors is None else set(collectors)
+        replayed = 0
+        # Whatever is still on its way to disk, waited for off the loop.
+        await asyncio.get_running_loop().run_in_executor(None, log.wait)
+        for _, uu, tags, data in log.records(start):
+            self.deliver(Event(data, uu, single_tag(tags[0]) if len(tags) == 1 else frozenset(tags)), names, run)
+            replayed += 1
+            if self.max_in_flight is not None and len(self._tasks) >= self.max_in_flight:
+                await self.wait_for_room()
+            elif not replayed % 1024:
+                # Give the collectors it started a turn.
+                await asyncio.sleep(0)
+        return replayed
+
+    # Matches an event that came from outside (a log, another bus) against this bus's collectors, inline and without showing it to listeners or the log.
+    def deliver(self, event: Event, collectors: Optional[Set[str]] = None, run: bool = True) -> None:
+        if self.metrics is not None:
+            self.count_event(event)
+        for func_slot in self.index.candidates(event):
+            if collectors is not None and func_slot.func.__name__ not in collectors:
+                continue
+            try:
+                if run and func_slot.debounce and self.hold(func_slot, event):
+                    continue
+                res = self.match(func_slot, event)
+                if res and run:
+                    func, kwargs = res
+                    if func_slot.batching:
+                        self.add_to_batch(func_slot, kwargs)
+                    else:
+                        self.complete(func, kwargs, event.uuid, func_slot)
+            except Exception as e:
+                self.collector_failed(func_slot.func, e)
+
+    def collector_failed(self, func: Callable, e: Exception) -> None:
+        asyncio.get_running_loop().call_exception_handler(
+            {"message": f"Exception in collector {func.__name__}", "exception": e}
+        )
+
+    def runs_on_loop(self, func: Callable, func_slot: FunctionSlot) -> bool:
+        return (
+            inspect.iscoroutinefunction(func)
+            or inspect.isasyncgenfunction(func)
+            or func_slot.executor == "inline"
+        )
+
+    def count_event(self, event: Event) -> None:
+        if event.tag:
+            for tag in event.tag:
+                self.metrics.count("events", tag)
+        else:
+            self.metrics.count("events", None)
+
+    # match_object, plus a record of whether the event completed the collection, filled part of it or was turned away, and how long the predicates and type checks took.
+    def match(self, func_slot: FunctionSlot, event: Event) -> Optional[Tuple[Callable, Dict[str, Any]]]:
+        metrics = self.metrics
+        if metrics is None:
+            res = func_slot.match_object(event)
+            if res and self.tracer is not None:
+                self.tracer.matched(event.uuid, func_slot.func.__name__, func_slot.waited)
+            return res
+        name = func_slot.func.__name__
+        joined = func_slot.joined
+        collection = None if func_slot.join_key is not None else func_slot.collection_slots.get(event.uuid)
+        before = len(func_slot.plan.names if collection is None else collection.empty_slots)
+        started = time.perf_counter()
+        res = func_slot.match_object(event)
+        metrics.observe("match_seconds", name, time.perf_counter() - started)
+        if res:
+            metrics.count("completions", name)
+        elif func_slot.join_key is not None:
+            metrics.count("matches" if func_slot.joined > joined else "rejections", name)
+        else:
+            collection = func_slot.collection_slots.get(event.uuid)
+            if collection is not None and len(collection.empty_slots) < before:
+                metrics.count("matches", name)
+            else:
+                metrics.count("rejections", name)
+        if res and self.tracer is not None:
+            self.tracer.matched(event.uuid, name, func_slot.waited)
+        return res
 
     async def check_for_match(self, func_slot: FunctionSlot, event: Event, uu: str):
-        res = await func_slot.match_object(event)
+        if func_slot.debounce and self.hold(func_slot, event):
+            return
+        res = self.match(func_slot, event)
         if res:
             func, kwargs = res
-            asyncio.create_task(self.schedule_completion(func, kwargs, uu))
+            if func_slot.batching:
+                self.add_to_batch(func_slot, kwargs)
+            else:
+                self.complete(func, kwargs, uu, func_slot)
+
+    # Starts a matched completion: in a task of its own, or queued in its priority class.
+    def complete(self, func: Callable, kwargs: Dict[str, Any], uu: str, func_slot: FunctionSlot) -> None:
+        if func_slot.conflate:
+            self.complete_latest(func, kwargs, uu, func_slot)
+        elif func_slot.scheduled:
+            self.scheduler.submit(func, kwargs, uu, func_slot)
+        else:
+            self.spawn(self.schedule_completion(func, kwargs, uu, func_slot), uu)
+
+    def complete_latest(self, func: Callable, kwargs: Dict[str, Any], uu: str, func_slot: FunctionSlot) -> None:
+        key = uu if func_slot.conflate is True else func_slot.conflate(kwargs)
+        latest = func_slot.latest.get(key)
+        if latest is None:
+            # Nothing running for this key, so this one starts now.
+            func_slot.latest[key] = Latest()
+            self.spawn(self.run_latest(func, kwargs, uu, func_slot, key), uu)
+            return
+        if latest.placeholder is not None:
+            if self.metrics is not None:
+                self.metrics.count("conflated", func.__name__)
+            latest.placeholder.set_result(None)
+        latest.kwargs = kwargs
+        latest.uuid = uu
+        latest.placeholder = self.track(asyncio.get_running_loop().create_future(), uu)
+
+    async def run_latest(
+        self, func: Callable, kwargs: Dict[str, Any], uu: str, func_slot: FunctionSlot, key: Hashable
+    ) -> None:
+        try:
+            if func_slot.scheduled:
+                await asyncio.shield(self.scheduler.submit(func, kwargs, uu, func_slot))
+            else:
+                await self.schedule_completion(func, kwargs, uu, func_slot)
+        finally:
+            latest = func_slot.latest.pop(key)
+            if latest.placeholder is not None:
+                # The newest match that came in meanwhile goes next, in a task of its own so it counts under its own uuid. It starts before this task ends, so drain() never sees a gap.
+                func_slot.latest[key] = Latest()
+                self.spawn(self.run_latest(func, latest.kwargs, latest.uuid, func_slot, key), latest.uuid)
+                latest.placeholder.set_result(None)
+
+    # Holds back an event for a debounced argument, replacing any event held for the same argument and uuid (or join key). Returns False if none of the slot's debounced arguments accepts the event.
+    def hold(self, func_slot: FunctionSlot, event: Event) -> bool:
+        plan = func_slot.plan
+        for i, name in enumerate(plan.names):
+            seconds = func_slot.debounce.get(name)
+            if seconds is not None and plan.accepts(i, event):
+                break
+        else:
+            return False
+        key = (event.uuid if func_slot.join_key is None else func_slot.join_key(event), name)
+        loop = asyncio.get_running_loop()
+        held = func_slot.held.get(key)
+        if held is None:
+            placeholder = self.track(loop.create_future(), event.uuid)
+            held = func_slot.held[key] = Held(event, None, placeholder)
+        else:
+            if self.metrics is not None:
+                self.metrics.count("debounced", func_slot.func.__name__)
+            held.timer.cancel()
+            if held.event.uuid != event.uuid:
+                held.placeholder.set_result(None)
+                held.placeholder = self.track(loop.create_future(), event.uuid)
+            held.event = event
+        held.timer = loop.call_later(seconds, self.release_held, func_slot, key)
+        return True
+
+    def release_held(self, func_slot: FunctionSlot, key: Tuple[Hashable, str]) -> None:
+        held = func_slot.held.pop(key)
+        try:
+            res = self.match(func_slot, held.event)
+            if res:
+                func, kwargs = res
+                if func_slot.batching:
+                    self.add_to_batch(func_slot, kwargs)
+                else:
+                    self.complete(func, kwargs, held.event.uuid, func_slot)
+        finally:
+            held.placeholder.set_result(None)
+
+    def add_to_batch(self, func_slot: FunctionSlot, kwargs: Dict[str, Any]) -> None:
+        func_slot.batch.append(kwargs)
+        if func_slot.batch_size is not None and len(func_slot.batch) >= func_slot.batch_size:
+            self.flush_batch(func_slot)
+        elif func_slot.max_wait is not None and func_slot.batch_timer is None:
+            func_slot.batch_timer = asyncio.get_running_loop().call_later(
+                func_slot.max_wait, self.flush_batch, func_slot
+            )
+
+    # A batch mixes collections from many uuids, so whatever the collector emits starts a new one.
+    def flush_batch(self, func_slot: FunctionSlot) -> None:
+        if not func_slot.batch:
+            return
+        kwargs = func_slot.take_batch()
+        uu = uuid4().hex
+        self.complete(func_slot.func, kwargs, uu, func_slot)
+
+    def flush_batches(self) -> None:
+        for func_slot in self.functions.values():
+            self.flush_batch(func_slot)
 
     async def schedule_completion(
-        self, func: Callable, kwargs: Dict[str, Any], uu: str
+        self,
+        func: Callable,
+        kwargs: Dict[str, Any],
+        uu: str,
+        func_slot: Optional[FunctionSlot] = None,
+        depth: int = 0,
+    ) -> None:
+        if self.metrics is not None:
+            started = time.perf_counter()
+        token = None
+        if self.tracer is not None and self.tracer.sampled(uu):
+            span = self.tracer.start(uu, func.__name__)
+            token = current_span.set(span)
+        try:
+            key = None
+            if func_slot is not None and func_slot.cache is not None:
+                key = cache_key(func, kwargs)
+            if key is not None:
+                await self.run_cached(func, kwargs, uu, func_slot, depth, key)
+            else:
+                await self.run_limited(func, kwargs, uu, func_slot, depth)
+        finally:
+            if token is not None:
+                self.tracer.finish(span)
+                current_span.reset(token)
+        if self.metrics is not None:
+            self.metrics.observe("completion_seconds", func.__name__, time.perf_counter() - started)
+
+    async def run_limited(
+        self,
+        func: Callable,
+        kwargs: Dict[str, Any],
+        uu: str,
+        func_slot: Optional[FunctionSlot] = None,
+        depth: int = 0,
+        outputs: Optional[List[Any]] = None,
+    ) -> None:
+        if func_slot is not None and func_slot.max_concurrency is not None:
+            async with func_slot.limiter():
+                await self.run_completion(func, kwargs, uu, func_slot, depth, outputs)
+        else:
+            await self.run_completion(func, kwargs, uu, func_slot, depth, outputs)
+
+    # A hit re-emits the stored outputs without calling the function (or waiting for max_concurrency). A miss while another call is computing the same key waits for that call; if it fails, this one runs the function itself.
+    async def run_cached(
+        self, func: Callable, kwargs: Dict[str, Any], uu: str, func_slot: FunctionSlot, depth: int, key: str
+    ) -> None:
+        outputs = func_slot.cache.get(key)
+        computing = func_slot.computing.get(key)
+        if outputs is None and computing is not None:
+            outputs = await asyncio.shield(computing)
+        if outputs is not None:
+            if self.metrics is not None:
+                self.metrics.count("cache_hits", func.__name__)
+            if func.__name__ in self.senders:
+                for obj in outputs:
+                    await self.publish(obj, uu, depth, func.__name__)
+            return
+        if self.metrics is not None:
+            self.metrics.count("cache_misses", func.__name__)
+        computing = func_slot.computing[key] = asyncio.get_running_loop().create_future()
+        outputs = []
+        try:
+            await self.run_limited(func, kwargs, uu, func_slot, depth, outputs)
+            func_slot.cache.set(key, outputs)
+        except BaseException:
+            outputs = None
+            raise
+        finally:
+            if func_slot.computing.get(key) is computing:
+                del func_slot.computing[key]
+            computing.set_result(outputs)
+
+    # None is the loop's default executor, "inline" runs the function on the loop itself.
+    @property
+    def generator_executor(self) -> ThreadPoolExecutor:
+        if self._generator_executor is None:
+            self._generator_executor = ThreadPoolExecutor(
+                self.generator_threads, thread_name_prefix="asynchronise-generator"
+            )
+        return self._generator_executor
+
+    # Names are looked up when the collector runs rather than in collect(), so a pool can be registered after the collectors that use it.
+    def resolve_executor(self, func_slot: Optional[FunctionSlot]) -> Union[None, str, Executor]:
+        executor = None if func_slot is None else func_slot.executor
+        if isinstance(executor, str) and executor != "inline":
+            try:
+                return self.executors[executor]
+            except KeyError:
+                raise ValueError(
+                    f"{func_slot.func.__name__} asked for executor {executor!r}, but none is registered under that name; "
+                    f"add it to executors first (known: {', '.join(map(repr, self.executors)) or 'none'})"
+                ) from None
+        return executor
+
+    async def run_completion(
+        self,
+        func: Callable,
+        kwargs: Dict[str, Any],
+        uu: str,
+        func_slot: Optional[FunctionSlot] = None,
+        depth: int = 0,
+        outputs: Optional[List[Any]] = None,
     ) -> None:
         # uu = get_uuid(**kwargs)
         if inspect.isasyncgenfunction(func):
             async for obj in func(
                 **kwargs
             ):  # this is calling the sender decorator implicitly.
-                if func.__name__ in self.senders:
-                    asyncio.create_task(self.create_event(obj, uu))
+                await self.output(obj, uu, depth, func, outputs)
         elif inspect.iscoroutinefunction(func):
-            obj = await asyncio.create_task(func(**kwargs))
-            if func.__name__ in self.senders:
-                asyncio.create_task(self.create_event(obj, uu))
+            obj = await func(**kwargs)
+            await self.output(obj, uu, depth, func, outputs)
         elif inspect.isgeneratorfunction(func):
-            for obj in func(**kwargs):
-                if func.__name__ in self.senders:
-                    asyncio.create_task(self.create_event(obj, uu))
+            executor = self.resolve_executor(func_slot)
+            if executor == "inline":
+                for obj in func(**kwargs):
+                    await self.output(obj, uu, depth, func, outputs)
+            else:
+                # A process can't stream items back, so generators asked to run in one use the generator threads instead.
+                if executor is None or isinstance(executor, ProcessPoolExecutor):
+                    executor = self.generator_executor
+                async for obj in iterate_in_thread(func(**kwargs), executor):
+                    await self.output(obj, uu, depth, func, outputs)
         else:
-            loop = asyncio.get_running_loop()
-            obj = await loop.run_in_executor(None, functools.partial(func, **kwargs))
-            if func.__name__ in self.senders:
-                asyncio.create_task(self.create_event(obj, uu))
+            executor = self.resolve_executor(func_slot)
+            if executor == "inline":
+                obj = func(**kwargs)
+            else:
+                shared = None
+                if self.transport is not None and isinstance(executor, ProcessPoolExecutor):
+                    shared = self.share_kwargs(kwargs)
+                    call = functools.partial(call_with_payloads, by_name(func), shared)
+                elif isinstance(executor, ProcessPoolExecutor):
+                    call = functools.partial(by_name(func), **kwargs)
+                else:
+                    call = functools.partial(func, **kwargs)
+                loop = asyncio.get_running_loop()
+                span = current_span.get() if self.tracer is not None else None
+                if span is not None and span.uuid != uu:
+                    span = None
+                try:
+                    if self.metrics is not None or span is not None:
+                        submitted = time.perf_counter()
+                        obj, ran = await loop.run_in_executor(
+                            executor, functools.partial(timed_call, call)
+                        )
+                        waited = max(time.perf_counter() - submitted - ran, 0.0)
+                        if self.metrics is not None:
+                            self.metrics.observe("queue_seconds", func.__name__, waited)
+                            self.metrics.observe("run_seconds", func.__name__, ran)
+                        if span is not None:
+                            span.attrs["queue_seconds"] = waited
+                            span.attrs["run_seconds"] = ran
+                    else:
+                        obj = await loop.run_in_executor(executor, call)
+                finally:
+                    if shared is not None:
+                        self.transport.release_kwargs(shared)
+            await self.output(obj, uu, depth, func, outputs)
+
+    # Whatever a collector yields or returns goes through here: recorded if its result is being cached, and published if it sends.
+    async def output(
+        self, obj: Any, uu: str, depth: int, func: Callable, outputs: Optional[List[Any]]
+    ) -> None:
+        if outputs is not None:
+            outputs.append(obj)
+        if func.__name__ in self.senders:
+            await self.publish(obj, uu, depth, func.__name__)
 
     def collect(
         self,
@@ -250,9 +1342,107 @@ class Asynchronise:
                 Optional[Callable[[Event], bool]],
             ],
         ],
+        max_age: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        on_expire: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+        plan_options: Optional[Dict[str, Any]] = None,
+        max_concurrency: Optional[int] = None,
+        executor: Union[None, str, Executor] = None,
+        batch_size: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        join_key: Optional[Callable[[Event], Hashable]] = None,
+        window: Union[None, int, float, Window] = None,
+        cache: Any = None,
+        priority: Optional[int] = None,
+        deadline: Optional[float] = None,
+        fallback: Optional[Callable] = None,
+        conflate: Union[bool, Callable[[Dict[str, Any]], Hashable]] = False,
+        debounce: Optional[Dict[str, float]] = None,
     ) -> Callable:
         def decorator(func: Callable) -> Callable:
-            self.functions[func.__name__] = FunctionSlot(func, keyword_lambdas)
+            self.register(
+                self.slot_class(
+                    func,
+                    keyword_lambdas,
+                    max_age=self.max_age if max_age is None else max_age,
+                    max_entries=self.max_entries if max_entries is None else max_entries,
+                    on_expire=self.on_expire if on_expire is None else on_expire,
+                    plan_options=plan_options,
+                    max_concurrency=max_concurrency,
+                    executor=executor,
+                    batch_size=batch_size,
+                    max_wait=max_wait,
+                    join_key=join_key,
+                    window=window,
+                    cache=cache,
+                    priority=priority,
+                    deadline=deadline,
+                    fallback=fallback,
+                    conflate=conflate,
+                    debounce=debounce,
+                )
+            )
             return func
 
-        return decorator
\ No newline at end of file
+        return decorator
+
+    # An async iterator over the events carrying `tag` (every event, if it's None), buffered up to maxsize; see Subscription.
+    def subscribe(
+        self,
+        tag: Optional[Hashable] = None,
+        maxsize: int = 1024,
+        batch: Optional[int] = None,
+        overflow: str = "drop_oldest",
+    ) -> Subscription:
+        subscription = Subscription(self, tag, maxsize, batch, overflow)
+        self.subscriptions.append(subscription)
+        self.listeners.append(subscription.put)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+            self.listeners.remove(subscription.put)
+
+    def register(self, func_slot: FunctionSlot) -> None:
+        previous = self.functions.get(func_slot.func.__name__)
+        if previous is not None and previous.func is not func_slot.func:
+            self.collisions.append(func_slot.func.__name__)
+        self.functions[func_slot.func.__name__] = func_slot
+        self.index.rebuild(self.functions.values())
+
+    # Builds the tag -> collector graph from what collectors accept and what senders declared they emit. Raises ValueError if two functions were registered under one name, or if collectors can trigger each other in a loop (unless allow_cycles). From then on, events with no subscribers are dropped before they're created.
+    def compile(self, allow_cycles: bool = False) -> PipelineGraph:
+        graph = build_graph(self)
+        if graph.collisions:
+            raise ValueError(
+                f"More than one function registered as {', '.join(graph.collisions)}; only the last of each is used"
+            )
+        if graph.cycles and not allow_cycles:
+            raise ValueError(
+                "Collectors can trigger each other in a loop: "
+                + "; ".join(" -> ".join(cycle) for cycle in graph.cycles)
+            )
+        self.elide = True
+        return graph
+
+    # For sweeping slots that have gone quiet; slots otherwise expire their own collections as events reach them.
+    def expire(self) -> None:
+        for func_slot in self.functions.values():
+            func_slot.expire()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.metrics.snapshot() if self.metrics is not None else {}
+        stats["in_flight"] = len(self._tasks)
+        stats["queued"] = self.scheduler.queued()
+        stats["pending"] = {
+            name: len(func_slot.collection_slots) for name, func_slot in self.functions.items()
+        }
+        stats["evicted"] = {
+            name: func_slot.evicted for name, func_slot in self.functions.items()
+        }
+        return stats
+
+    @property
+    def evicted(self) -> int:
+        return sum(func_slot.evicted for func_slot in self.functions.values())
\ No newline at end of file
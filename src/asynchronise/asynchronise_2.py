@@ -13,33 +13,48 @@ async def bread_maker(flour: Optional[Flour], eggs: List[Egg]):
 would be cool if it could collect lists of a certain length?
 """
 
-import asyncio
-
 # from loguru import logger
 
 # print = logger.info
-import functools
 from typing import (
     Any,
-    AsyncGenerator,
-    Awaitable,
     Callable,
-    Coroutine,
     Dict,
-    List,
     Optional,
     Set,
     Type,
     Union,
     Tuple,
     Hashable,
+    get_type_hints,
+    get_origin,
+    get_args,
 )
-from uuid import uuid4
-from threading import Lock
+from abc import ABCMeta
+import collections.abc
 from typeguard import check_type
 
+from .asynchronise import (
+    Asynchronise as _Asynchronise,
+    Event,
+    FunctionSlot as _FunctionSlot,
+    get_uuid,
+    set_signature,
+)
+
+# get_uuid and set_signature used to be defined here, so they're still importable from this module.
+__all__ = [
+    "Asynchronise",
+    "CollectorPlan",
+    "Event",
+    "FunctionSlot",
+    "get_uuid",
+    "is_correct_type",
+    "set_signature",
+]
 
-def is_correct_type(data: Any, type_: Type) -> bool:
+
+def full_type_check(data: Any, type_: Type) -> bool:
     try:
         check_type("var", data, type_)
         return True
@@ -47,32 +62,112 @@ def is_correct_type(data: Any, type_: Type) -> bool:
         return False
 
 
-class Event:
-    def __init__(self, data: Any, uuid: str):
-        self.data = data
-        self.uuid = uuid
-        self._lock = Lock()
-        self.tag = set()
-
-    # Ideally, we'd like to be able to call methods on and get attributes from the data as if it were the data itself, so we can override getattr and setattr.
-    def __getattr__(self, name: str) -> Any:
-        if name not in self.__dict__:
-            # with self._lock:
-            return self.__getattribute__("data").__getattribute__(name)
-        return self.__getattribute__(name)
+# Verdicts for annotations where the answer only depends on type(data), so check_type runs once per (type, annotation) pair instead of once per event.
+_verdicts: Dict[Tuple[Type, Any], bool] = {}
+_decidable: Dict[Any, bool] = {}
 
-    # And a convenience function for getting the type of the data
-    def istype(self, cls: Type) -> bool:
-        return isinstance(self.data, cls)
-
-    def __repr__(self) -> str:
-        return f"<{self.__class__.__name__} {self.data}>"
-
-
-from collections import namedtuple
 
+def is_decidable(type_: Any) -> bool:
+    try:
+        decidable = _decidable.get(type_)
+    except TypeError:
+        # Unhashable annotation, so there's nothing to cache against either way.
+        return False
+    if decidable is not None:
+        return decidable
+    origin = get_origin(type_)
+    if type_ is Any:
+        decidable = True
+    elif origin is Union:
+        decidable = all(is_decidable(arg) for arg in get_args(type_))
+    else:
+        # Plain classes, except the ones typeguard inspects the value of: NamedTuples and TypedDicts check their fields, protocols check the instance's attributes.
+        decidable = (
+            origin is None
+            and inspect.isclass(type_)
+            and type(type_) in (type, ABCMeta)
+            and not issubclass(type_, tuple)
+            and not getattr(type_, "_is_protocol", False)
+            and not hasattr(type_, "__total__")
+        )
+    _decidable[type_] = decidable
+    return decidable
+
+
+_sequences = (
+    list,
+    set,
+    frozenset,
+    collections.abc.Sequence,
+    collections.abc.MutableSequence,
+    collections.abc.Set,
+    collections.abc.MutableSet,
+)
+_mappings = (dict, collections.abc.Mapping, collections.abc.MutableMapping)
+
+
+# Checks a parametrised container by its first element rather than every element.
+def sampled_type_check(data: Any, type_: Any) -> bool:
+    origin = get_origin(type_)
+    args = get_args(type_)
+    if origin is Union:
+        return any(is_correct_type(data, arg, strict=False) for arg in args)
+    if origin in _sequences and len(args) == 1:
+        if not isinstance(data, origin):
+            return False
+        for item in data:
+            return is_correct_type(item, args[0], strict=False)
+        return True
+    if origin in _mappings and len(args) == 2:
+        if not isinstance(data, origin):
+            return False
+        for key, value in data.items():
+            return is_correct_type(key, args[0], strict=False) and is_correct_type(
+                value, args[1], strict=False
+            )
+        return True
+    if origin is tuple and len(args) == 2 and args[1] is Ellipsis:
+        if not isinstance(data, tuple):
+            return False
+        return not data or is_correct_type(data[0], args[0], strict=False)
+    return full_type_check(data, type_)
+
+
+# CollectorPlan works out `decidable` once per argument; other callers leave it to be looked up.
+def is_correct_type(
+    data: Any, type_: Type, strict: bool = True, decidable: Optional[bool] = None
+) -> bool:
+    if type_ is Any:
+        return True
+    if decidable is None:
+        decidable = is_decidable(type_)
+    if decidable:
+        key = (type(data), type_)
+        verdict = _verdicts.get(key)
+        if verdict is None:
+            verdict = _verdicts[key] = full_type_check(data, type_)
+        return verdict
+    if strict:
+        return full_type_check(data, type_)
+    return sampled_type_check(data, type_)
+
+
+# Batch collectors take List[T] arguments, and each event is checked against T.
+def batch_item_type(func: Callable, name: str, annotation: Any) -> Any:
+    if annotation is Any:
+        return Any
+    if get_origin(annotation) is list:
+        args = get_args(annotation)
+        return args[0] if args else Any
+    raise TypeError(
+        f"{func.__name__} collects batches, so {name} must be annotated as a List, not {annotation}"
+    )
+
+
+class CollectorPlan:
+    # The signature is only read once per collector: each argument accepts events tagged with its own name, of its annotated type, that pass its predicate (if it has one).
+    __slots__ = ("func", "names", "annotations", "decidable", "predicates", "strict")
 
-class UniqueCollection:
     def __init__(
         self,
         func: Callable,
@@ -80,201 +175,61 @@ class UniqueCollection:
             str,
             Callable,
         ],
-        uuid: str,
+        strict: bool = True,
+        batch: bool = False,
     ) -> None:
         self.func = func
-        self.func_arguments = [
-            p.name for p in inspect.signature(func).parameters.values()
-        ]
-        self.func_annotations = [
-            p.annotation for p in inspect.signature(func).parameters.values()
-        ]
-        self.argument_annotations: Dict = {}
-        for argname, annotation in zip(self.func_arguments, self.func_annotations):
-            if annotation is inspect._empty:
-                self.argument_annotations[argname] = Any
-            else:
-                self.argument_annotations[argname] = annotation
-        self.keyword_lambdas = {
-            key: lambda x: True for key in self.func_arguments
-        }
-        self.keyword_lambdas.update(keyword_lambdas)
-        self.collection: Dict[str, Any] = {k: None for k in self.func_arguments}
-        self.uuid = uuid
-        self.empty_slots = set(self.collection.keys())
-        for key, val in self.__dict__.items():
-            print(key, val)
-
-    async def check_object(self, obj: Event) -> Optional[Dict[str, Any]]:
-        to_remove = set()
-        for k in self.empty_slots:
-            condition = self.keyword_lambdas.get(k, lambda x: False)
-            if (
-                condition(obj)
-                and k in obj.tag
-                and is_correct_type(obj.data, self.argument_annotations[k])
-            ):
-                self.collection[k] = obj.data
-                to_remove.add(k)
-                #print("Added to collection:", k)
-            else:
-                pass
-                #print("Not added to collection:", k, type(obj.data), obj.data)
-        self.empty_slots -= to_remove
-        if len(self.empty_slots) == 0:
-            return self.collection
-
-
-class FunctionSlot:
-    def __init__(
-        self,
-        func: Callable,
-        keyword_lambdas: Dict[str, Callable[[Event], bool]],
-    ) -> None:
-        self.func = func
-        self.keyword_lambdas = keyword_lambdas
-        self.collection_slots: Dict[str, UniqueCollection] = {}
-
-    async def match_object(self, obj: Event):
-        if obj.uuid not in self.collection_slots.keys():
-            # print("Creating new collection")
-            self.collection_slots[obj.uuid] = UniqueCollection(
-                self.func, self.keyword_lambdas, obj.uuid
+        self.strict = strict
+        parameters = list(inspect.signature(func).parameters.values())
+        try:
+            hints = get_type_hints(func)
+        except Exception:
+            hints = {}
+        self.names: Tuple[str, ...] = tuple(p.name for p in parameters)
+        self.annotations: Tuple[Any, ...] = tuple(
+            Any
+            if p.annotation is inspect.Parameter.empty
+            else hints.get(p.name, p.annotation)
+            for p in parameters
+        )
+        self.predicates: Tuple[Optional[Callable[[Event], bool]], ...] = tuple(
+            keyword_lambdas.get(k) for k in self.names
+        )
+        if batch:
+            self.annotations = tuple(
+                batch_item_type(func, k, annotation)
+                for k, annotation in zip(self.names, self.annotations)
             )
-        collection = self.collection_slots[obj.uuid]
-        result = await collection.check_object(obj)
-        if result is not None:
-            # print("Returning result")
-            del self.collection_slots[obj.uuid]
-            return (self.func, result)
+        self.decidable: Tuple[bool, ...] = tuple(is_decidable(a) for a in self.annotations)
+
+    def accepts(self, i: int, obj: Event) -> bool:
+        predicate = self.predicates[i]
+        return (
+            self.names[i] in obj.tag
+            and is_correct_type(obj.data, self.annotations[i], self.strict, self.decidable[i])
+            and (predicate is None or predicate(obj))
+        )
+
+
+class FunctionSlot(_FunctionSlot):
+    plan_class = CollectorPlan
+
+    # Every argument only accepts events tagged with its own name, so the argument names are the whole index. A function without arguments completes on any event.
+    def dispatch_keys(self) -> Tuple[Set[Hashable], Set[Type], bool]:
+        tags = set(self.plan.names)
+        return tags, set(), not tags
 
 
 import inspect
 
 
-def get_uuid(*args, **kwargs):
-    uus = [x.uuid for x in args if isinstance(x, Event)] + [
-        v.uuid for k, v in kwargs.items() if isinstance(v, Event)
-    ]
-    if uus:
-        uu = uus[0]
-        # print("UUID WAS FOUND IN THE ARGS:", uu)
-    else:
-        # print("No uuids found")
-        uu = uuid4().hex
-    return uu
-
-
-import random
-import ast
-
-def set_signature(func1: Callable, func2: Callable):
-    func1.__name__ = func2.__name__
-    func1.__doc__ = func2.__doc__
-    func1.__annotations__ = func2.__annotations__
-    func1.__kwdefaults__ = func2.__kwdefaults__
-    func1.__defaults__ = func2.__defaults__
-    return func1
-
-
-class Asynchronise:
-    def __init__(self, name: Optional[str] = None) -> None:
-        self.functions: Dict[str, FunctionSlot] = {}
-        self.senders: Set[str] = set()
-        self.name = (
-            name
-            if name
-            else "".join(list(map(lambda x: chr(random.randint(97, 122)), range(10))))
-        )
+class Asynchronise(_Asynchronise):
+    slot_class = FunctionSlot
 
-    def send(self, func: Callable) -> Callable:
-        self.senders.add(func.__name__)
-
-        async def async_generator_decorator(*args, **kwargs) -> Any:
-            uu = get_uuid(*args, **kwargs)
-            async for obj in func(*args, **kwargs):
-                asyncio.create_task(self.create_event(obj, uu))
-                yield obj
-
-        async def sync_generator_decorator(*args, **kwargs) -> Any:
-            uu = get_uuid(*args, **kwargs)
-            for obj in func(*args, **kwargs):
-                asyncio.create_task(self.create_event(obj, uu))
-                yield obj
-
-        async def async_function_decorator(*args, **kwargs) -> Any:
-            uu = get_uuid(*args, **kwargs)
-            obj = await func(*args, **kwargs)
-            asyncio.create_task(self.create_event(obj, uu))
-            return obj
-
-        async def sync_function_decorator(*args, **kwargs) -> Any:
-            uu = get_uuid(*args, **kwargs)
-            loop = asyncio.get_running_loop()
-            obj = await loop.run_in_executor(
-                None, functools.partial(func, *args, **kwargs)
-            )
-            asyncio.create_task(self.create_event(obj, uu))
-            return obj
-
-        if inspect.isasyncgenfunction(func):
-            # logger.debug(f"Wrapping {func.__name__} as an async generator")
-            set_signature(async_generator_decorator, func)
-            return async_generator_decorator
-        elif inspect.iscoroutinefunction(func):
-            # logger.debug(f"Wrapping {func.__name__} as a coroutine")
-            set_signature(async_function_decorator, func)
-            return async_function_decorator
-        elif inspect.isgeneratorfunction(func):
-            # logger.debug(f"Wrapping {func.__name__} as a generator")
-            set_signature(sync_generator_decorator, func)
-            return sync_generator_decorator
-        else:
-            # logger.debug(f"Wrapping {func.__name__} as a function")
-            set_signature(sync_function_decorator, func)
-            return sync_function_decorator
-
-    async def create_event(self, obj: Any, uu: str):
-        if isinstance(obj, tuple):
-            event = Event(obj[0], uu)
-            for tag in obj[1:]:
-                event.tag.add(tag)
-        else:
-            event = Event(obj, uu)
-        [
-            asyncio.create_task(self.check_for_match(func_slot, event, uu))
-            for func_slot in self.functions.values()
-        ]
-
-    async def check_for_match(self, func_slot: FunctionSlot, event: Event, uu: str):
-        res = await func_slot.match_object(event)
-        if res:
-            func, kwargs = res
-            asyncio.create_task(self.schedule_completion(func, kwargs, uu))
-
-    async def schedule_completion(
-        self, func: Callable, kwargs: Dict[str, Any], uu: str
-    ) -> None:
-        # uu = get_uuid(**kwargs)
-        if inspect.isasyncgenfunction(func):
-            async for obj in func(
-                **kwargs
-            ):  # this is calling the sender decorator implicitly.
-                if func.__name__ in self.senders:
-                    asyncio.create_task(self.create_event(obj, uu))
-        elif inspect.iscoroutinefunction(func):
-            obj = await asyncio.create_task(func(**kwargs))
-            if func.__name__ in self.senders:
-                asyncio.create_task(self.create_event(obj, uu))
-        elif inspect.isgeneratorfunction(func):
-            for obj in func(**kwargs):
-                if func.__name__ in self.senders:
-                    asyncio.create_task(self.create_event(obj, uu))
-        else:
-            loop = asyncio.get_running_loop()
-            obj = await loop.run_in_executor(None, functools.partial(func, **kwargs))
-            if func.__name__ in self.senders:
-                asyncio.create_task(self.create_event(obj, uu))
+    # strict_types=False checks parametrised containers (List[int], Dict[str, Egg]...) by their first element instead of all of them.
+    def __init__(self, *args: Any, strict_types: bool = True, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.strict_types = strict_types
 
     def collect(
         self,
@@ -284,11 +239,18 @@ class Asynchronise:
                 Callable[[Event], bool],
             ]
         ] = None,
+        strict_types: Optional[bool] = None,
+        **options: Any,
     ) -> Callable:
         if keyword_lambdas is None:
             keyword_lambdas = {}
-        def decorator(func: Callable) -> Callable:
-            self.functions[func.__name__] = FunctionSlot(func, keyword_lambdas)
-            return func
-
-        return decorator
+        if strict_types is None:
+            strict_types = self.strict_types
+        batch = (
+            options.get("batch_size") is not None or options.get("max_wait") is not None
+        )
+        return super().collect(
+            keyword_lambdas,
+            plan_options={"strict": strict_types, "batch": batch},
+            **options,
+        )
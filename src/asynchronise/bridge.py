@@ -0,0 +1,212 @@
+"""
+Connects buses in different processes (or on different hosts) over Unix domain sockets or TCP, so collectors can be
+moved out of a pipeline's process without rewriting it:
+
+    # the main process
+    bridge = Bridge(asyncer)
+    await bridge.serve_unix("/tmp/pipeline.sock")
+
+    # a worker process, whose bus only registers the CPU-heavy collectors
+    bridge = Bridge(worker_asyncer)
+    await bridge.connect_unix("/tmp/pipeline.sock")
+
+Each side advertises the tags its collectors subscribe to, and only events carrying one of them are sent across, so
+it doesn't matter which side listens and which connects. Events arriving from a peer are matched against the local
+collectors but aren't forwarded again, so they can't bounce back and forth. Call advertise() after registering more
+collectors on a bus that's already connected.
+
+Frames are a one-byte kind and a four-byte length followed by the serialized payload. Events are sent in batches of
+up to `batch_size`, at most `flush_interval` seconds after the first of them. The default serializer is pickle, which
+will run whatever a peer sends it, so only connect buses that trust each other, or pass other `dumps`/`loads`.
+"""
+
+import asyncio
+import pickle
+import struct
+from typing import Any, Callable, Dict, FrozenSet, Hashable, List, Optional, Set, Tuple
+
+from .asynchronise import Asynchronise, Event
+
+HELLO = 1
+SUBSCRIBE = 2
+EVENTS = 3
+
+_header = struct.Struct("<BI")
+
+
+class Peer:
+    def __init__(self, bridge: "Bridge", reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.bridge = bridge
+        self.reader = reader
+        self.writer = writer
+        self.name: Optional[str] = None
+        # The tags the other side's collectors subscribe to; None means it wants everything.
+        self.tags: Optional[FrozenSet[Hashable]] = frozenset()
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.pending: List[Tuple[str, Tuple[Hashable, ...], Any]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def wants(self, event: Event) -> bool:
+        return self.tags is None or not self.tags.isdisjoint(event.tag)
+
+    def send_frame(self, kind: int, payload: bytes) -> None:
+        if not self.closed:
+            self.writer.write(_header.pack(kind, len(payload)) + payload)
+
+    def queue(self, event: Event) -> None:
+        data = event.data
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        self.pending.append((event.uuid, tuple(event.tag), data))
+        if len(self.pending) >= self.bridge.batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.bridge.flush_interval, self.flush)
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending:
+            batch, self.pending = self.pending, []
+            self.send_frame(EVENTS, self.bridge.dumps(batch))
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.name}>"
+
+
+class Bridge:
+    def __init__(
+        self,
+        bus: Asynchronise,
+        dumps: Callable[[Any], bytes] = pickle.dumps,
+        loads: Callable[[bytes], Any] = pickle.loads,
+        batch_size: int = 256,
+        flush_interval: float = 0.001,
+    ) -> None:
+        self.bus = bus
+        self.dumps = dumps
+        self.loads = loads
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.peers: List[Peer] = []
+        # Outgoing connections by address, so connecting to the same place twice reuses the first connection.
+        self.connections: Dict[Hashable, Peer] = {}
+        self.servers: List[asyncio.AbstractServer] = []
+        self._readers: Set[asyncio.Task] = set()
+        bus.listeners.append(self.forward)
+
+    # What this bus's collectors subscribe to. Collectors matching on type or on anything can't be expressed as tags, so then every event is wanted.
+    def subscriptions(self) -> Optional[FrozenSet[Hashable]]:
+        index = self.bus.index
+        if index.wildcard or index.by_type:
+            return None
+        return frozenset(index.by_tag)
+
+    def forward(self, event: Event) -> None:
+        for peer in self.peers:
+            if peer.wants(event):
+                peer.queue(event)
+
+    def advertise(self) -> None:
+        payload = self.dumps(self.subscriptions())
+        for peer in self.peers:
+            peer.send_frame(SUBSCRIBE, payload)
+
+    async def serve_unix(self, path: str) -> asyncio.AbstractServer:
+        server = await asyncio.start_unix_server(self._accept, path)
+        self.servers.append(server)
+        return server
+
+    async def serve_tcp(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        server = await asyncio.start_server(self._accept, host, port)
+        self.servers.append(server)
+        return server
+
+    async def connect_unix(self, path: str) -> Peer:
+        return await self._connect(("unix", path), lambda: asyncio.open_unix_connection(path))
+
+    async def connect_tcp(self, host: str, port: int) -> Peer:
+        return await self._connect(("tcp", host, port), lambda: asyncio.open_connection(host, port))
+
+    async def _connect(self, address: Hashable, opener: Callable) -> Peer:
+        peer = self.connections.get(address)
+        if peer is None or peer.closed:
+            reader, writer = await opener()
+            peer = self.connections[address] = self.attach(reader, writer)
+        await peer.ready.wait()
+        return peer
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.attach(reader, writer)
+
+    def attach(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Peer:
+        peer = Peer(self, reader, writer)
+        self.peers.append(peer)
+        peer.send_frame(HELLO, self.dumps((self.bus.name, self.subscriptions())))
+        task = asyncio.create_task(self.read(peer))
+        self._readers.add(task)
+        task.add_done_callback(self._readers.discard)
+        return peer
+
+    async def read(self, peer: Peer) -> None:
+        reader = peer.reader
+        try:
+            while True:
+                kind, length = _header.unpack(await reader.readexactly(_header.size))
+                payload = self.loads(await reader.readexactly(length))
+                if kind == EVENTS:
+                    for uu, tags, data in payload:
+                        self.bus.deliver(Event(data, uu, tags))
+                elif kind == SUBSCRIBE:
+                    peer.tags = payload
+                elif kind == HELLO:
+                    peer.name, peer.tags = payload
+                    peer.ready.set()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.disconnect(peer)
+
+    def disconnect(self, peer: Peer) -> None:
+        if peer.closed:
+            return
+        peer.flush()
+        peer.closed = True
+        if peer.timer is not None:
+            peer.timer.cancel()
+        if peer in self.peers:
+            self.peers.remove(peer)
+        peer.writer.close()
+        # Wake anyone still waiting for a hello that's never coming.
+        peer.ready.set()
+
+    # Sends whatever is waiting in the batches and waits for it to be written out.
+    async def flush(self) -> None:
+        for peer in list(self.peers):
+            peer.flush()
+            try:
+                await peer.writer.drain()
+            except ConnectionError:
+                self.disconnect(peer)
+
+    async def close(self) -> None:
+        await self.flush()
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        for peer in list(self.peers):
+            self.disconnect(peer)
+        for task in list(self._readers):
+            task.cancel()
+        if self._readers:
+            await asyncio.wait(self._readers)
+        if self.forward in self.bus.listeners:
+            self.bus.listeners.remove(self.forward)
+
+    async def __aenter__(self) -> "Bridge":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
@@ -0,0 +1,97 @@
+"""
+Result caches for pure collectors: collect(cache=...) skips calling the function when it has already been called with
+equal arguments, and re-emits whatever it yielded or returned that time.
+
+Keys are a sha256 of the pickled arguments, so arguments that don't pickle are never cached, and ones whose pickles
+vary between processes (sets of strings, say) only hit within the process that stored them. A cache is anything with
+get(key) -> Optional[list of outputs] and set(key, outputs).
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def cache_key(func: Callable, kwargs: Dict[str, Any]) -> Optional[str]:
+    try:
+        payload = pickle.dumps(
+            (func.__module__, func.__qualname__, sorted(kwargs.items(), key=lambda item: item[0])),
+            protocol=4,
+        )
+    except Exception:
+        return None
+    return hashlib.sha256(payload).hexdigest()
+
+
+class MemoryCache:
+    # Least recently used entries go first once there are more than max_entries; with a ttl, entries also go that many seconds after they were stored. Hits hand back the very objects that were emitted the first time, so collectors downstream shouldn't mutate them.
+    def __init__(self, max_entries: Optional[int] = 1024, ttl: Optional[float] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[float, List[Any]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[List[Any]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        stored, outputs = entry
+        if self.ttl is not None and time.monotonic() - stored > self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return outputs
+
+    def set(self, key: str, outputs: List[Any]) -> None:
+        self.entries[key] = (time.monotonic(), outputs)
+        self.entries.move_to_end(key)
+        if self.max_entries is not None:
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class DiskCache:
+    # One pickle file per entry, so the cache survives restarts and can be shared by processes on the same machine. Outputs that don't pickle aren't stored. Reads and writes happen on the event loop, so this suits outputs that are expensive to compute rather than large.
+    def __init__(self, directory: str, ttl: Optional[float] = None) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".pickle")
+
+    def get(self, key: str) -> Optional[List[Any]]:
+        path = self.path(key)
+        try:
+            if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key: str, outputs: List[Any]) -> None:
+        try:
+            data = pickle.dumps(outputs)
+        except Exception:
+            return
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed into place, so readers never see half an entry.
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+    def clear(self) -> None:
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".pickle"):
+                    os.remove(os.path.join(root, name))
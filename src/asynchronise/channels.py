@@ -0,0 +1,119 @@
+import asyncio
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Hashable, List, Optional, Union
+
+if TYPE_CHECKING:
+    from .asynchronise import Asynchronise, Event
+
+
+class SubscriptionClosed(Exception):
+    # Raised by get() once the subscription is closed and emptied. Not StopAsyncIteration, which turns into a RuntimeError when it escapes an async generator.
+    pass
+
+
+class Subscription:
+    # A bounded buffer of the bus's events carrying `tag` (every event if it's None), for reading at the consumer's own pace instead of through a collector. When it's full, "drop_oldest" makes room by discarding the oldest event, and "block" makes senders wait at their next yield until the consumer catches up (events already on their way are still kept).
+    def __init__(
+        self,
+        bus: "Asynchronise",
+        tag: Optional[Hashable] = None,
+        maxsize: int = 1024,
+        batch: Optional[int] = None,
+        overflow: str = "drop_oldest",
+    ) -> None:
+        if overflow not in ("drop_oldest", "block"):
+            raise ValueError(f"overflow must be 'drop_oldest' or 'block', not {overflow!r}")
+        self.bus = bus
+        self.tag = tag
+        self.maxsize = maxsize
+        self.batch = batch
+        self.overflow = overflow
+        self.buffer: Deque["Event"] = deque(maxlen=maxsize if overflow == "drop_oldest" else None)
+        self.dropped = 0
+        self.closed = False
+        self._readable: Optional[asyncio.Future] = None
+        self._writable: Optional[asyncio.Future] = None
+
+    @property
+    def full(self) -> bool:
+        return len(self.buffer) >= self.maxsize
+
+    def wants(self, obj: Any) -> bool:
+        return self.tag is None or (isinstance(obj, tuple) and self.tag in obj[1:])
+
+    # The bus's listener.
+    def put(self, event: "Event") -> None:
+        if self.closed or (self.tag is not None and self.tag not in event.tag):
+            return
+        if self.overflow == "drop_oldest" and len(self.buffer) >= self.maxsize:
+            self.dropped += 1
+        self.buffer.append(event)
+        if self._readable is not None and not self._readable.done():
+            self._readable.set_result(None)
+
+    async def room(self) -> None:
+        while self.full and not self.closed:
+            if self._writable is None or self._writable.done():
+                self._writable = asyncio.get_running_loop().create_future()
+            await self._writable
+
+    def _taken(self) -> None:
+        if self._writable is not None and not self._writable.done() and not self.full:
+            self._writable.set_result(None)
+
+    async def _wait_readable(self) -> None:
+        while not self.buffer and not self.closed:
+            if self._readable is None or self._readable.done():
+                self._readable = asyncio.get_running_loop().create_future()
+            await self._readable
+
+    async def get(self) -> "Event":
+        await self._wait_readable()
+        if not self.buffer:
+            raise SubscriptionClosed(self.tag)
+        event = self.buffer.popleft()
+        self._taken()
+        return event
+
+    # Waits for at least one event (or until timeout, returning []), then takes up to max_items of them, or `batch`, or everything buffered.
+    async def get_many(
+        self, max_items: Optional[int] = None, timeout: Optional[float] = None
+    ) -> List["Event"]:
+        try:
+            await asyncio.wait_for(self._wait_readable(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        if max_items is None:
+            max_items = self.batch or len(self.buffer)
+        popleft = self.buffer.popleft
+        events = [popleft() for _ in range(min(max_items, len(self.buffer)))]
+        self._taken()
+        return events
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    # One event at a time, or lists of up to `batch`. Ends once the subscription is closed and emptied.
+    async def __anext__(self) -> Union["Event", List["Event"]]:
+        if self.batch is None:
+            try:
+                return await self.get()
+            except SubscriptionClosed:
+                raise StopAsyncIteration from None
+        events = await self.get_many()
+        if not events:
+            raise StopAsyncIteration
+        return events
+
+    def close(self) -> None:
+        self.closed = True
+        self.bus.unsubscribe(self)
+        for future in (self._readable, self._writable):
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.tag} {len(self.buffer)}/{self.maxsize}>"
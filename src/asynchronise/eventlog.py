@@ -0,0 +1,202 @@
+"""
+An append-only log of every event a bus creates, for recovering after a crash and for re-running collectors over old
+traffic.
+
+Records are appended to numbered segment files in a directory, each one framed as a length and a crc32 followed by
+the pickled (uuid, tags, data). Writes are buffered and handed in batches to a writer thread that writes and fsyncs
+them, so the loop never waits on the disk. A batch is handed over once it has `sync_every` records or its first one is
+`sync_interval` seconds old (on a timer, when appending from an event loop, so a quiet spell doesn't leave records
+sitting in memory). A crash loses at most those and the batches the writer hasn't got to yet, and a torn record at the
+end of the last segment is dropped when the log is reopened. Events whose data can't be serialized are
+counted in `skipped` and left out of the log (they're still dispatched):
+
+    log = EventLog("events/")
+    asyncer = Asynchronise(log=log)
+    ...
+    # later, with a fresh bus and maybe some new collectors:
+    await asyncer.replay(EventLog("events/"), collectors=["new_report"])
+"""
+
+import asyncio
+import mmap
+import os
+import pickle
+import struct
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Generator, Hashable, List, Optional, Tuple
+
+_frame = struct.Struct("<II")
+
+
+def segment_name(offset: int) -> str:
+    return f"{offset:020d}.log"
+
+
+class EventLog:
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        sync_every: int = 1024,
+        sync_interval: float = 0.1,
+        dumps: Callable[[Any], bytes] = pickle.dumps,
+        loads: Callable[[Any], Any] = pickle.loads,
+    ) -> None:
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.dumps = dumps
+        self.loads = loads
+        os.makedirs(directory, exist_ok=True)
+        # The offset of the first record in each segment, which is also its file name.
+        self.segments: List[int] = sorted(
+            int(name[:-4]) for name in os.listdir(directory) if name.endswith(".log")
+        )
+        if not self.segments:
+            self.segments.append(0)
+        # The offset the next record will get.
+        self.offset = self.segments[-1] + self.recover(self.segments[-1])
+        # The file and its size belong to the writer thread once it's started.
+        self.file = open(self.path(self.segments[-1]), "ab", buffering=0)
+        self.size = self.file.tell()
+        self.buffer = bytearray()
+        self.pending = 0
+        self.synced = time.monotonic()
+        self.skipped = 0
+        # One thread, so batches are written in the order they were flushed.
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="eventlog")
+        self.written: Optional[Future] = None
+        # Flushes the batch sync_interval after its first record, if nothing else does sooner.
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def path(self, segment: int) -> str:
+        return os.path.join(self.directory, segment_name(segment))
+
+    # Counts the whole records in a segment, and cuts off whatever a crash left half-written after them.
+    def recover(self, segment: int) -> int:
+        path = self.path(segment)
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        end = 0
+        for count, end, _ in self.frames(segment):
+            count += 1
+        if end != os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(end)
+        return count
+
+    # Returns the record's offset, or None if its data couldn't be serialized.
+    def append(self, uu: str, tags: Tuple[Hashable, ...], data: Any) -> Optional[int]:
+        if isinstance(data, memoryview):
+            # Views (onto shared payloads, say) don't pickle.
+            data = data.tobytes()
+        try:
+            payload = self.dumps((uu, tags, data))
+        except Exception:
+            # A lock, a socket, a lambda...: not worth failing the event over.
+            self.skipped += 1
+            return None
+        self.buffer += _frame.pack(len(payload), zlib.crc32(payload))
+        self.buffer += payload
+        self.pending += 1
+        offset = self.offset
+        self.offset += 1
+        if (
+            self.pending >= self.sync_every
+            or time.monotonic() - self.synced >= self.sync_interval
+        ):
+            self.flush()
+        else:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # No loop to keep time: the next append, flush() or close() writes it.
+                loop = None
+            # One already past due belongs to a loop that stopped before it fired.
+            if loop is not None and (self.timer is None or self.timer.when() < loop.time()):
+                self.timer = loop.call_later(self.sync_interval, self.flush)
+        return offset
+
+    # Hands what's buffered to the writer thread without waiting for it.
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending:
+            buffer, self.buffer = self.buffer, bytearray()
+            self.pending = 0
+            self.written = self.writer.submit(self.write, buffer, self.offset)
+        self.synced = time.monotonic()
+
+    # On the writer thread. `offset` is the offset of the record after the batch, where a new segment would start.
+    def write(self, buffer: bytearray, offset: int) -> None:
+        self.file.write(buffer)
+        self.size += len(buffer)
+        os.fsync(self.file.fileno())
+        if self.size >= self.segment_bytes:
+            self.file.close()
+            self.file = open(self.path(offset), "ab", buffering=0)
+            self.size = 0
+            self.segments.append(offset)
+
+    # Flushes and blocks until everything appended so far is on disk, raising whatever the writer ran into.
+    def wait(self) -> None:
+        self.flush()
+        if self.written is not None:
+            self.written.result()
+
+    def close(self) -> None:
+        try:
+            self.wait()
+        finally:
+            self.writer.shutdown()
+            self.file.close()
+
+    # (index in the segment, end of the record, a view of its payload) for every intact record, straight out of an mmap of the file.
+    def frames(self, segment: int) -> Generator[Tuple[int, int, memoryview], None, None]:
+        path = self.path(segment)
+        if not os.path.getsize(path):
+            return
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                position = 0
+                index = 0
+                while position + _frame.size <= len(view):
+                    length, crc = _frame.unpack_from(view, position)
+                    start = position + _frame.size
+                    payload = view[start : start + length]
+                    if len(payload) < length or zlib.crc32(payload) != crc:
+                        payload.release()
+                        break
+                    position = start + length
+                    try:
+                        yield index, position, payload
+                    finally:
+                        payload.release()
+                    index += 1
+            finally:
+                view.release()
+
+    # Every record from `start` on, as (offset, uuid, tags, data). What's still buffered is written out first so it's included.
+    def records(self, start: int = 0) -> Generator[Tuple[int, str, Tuple[Hashable, ...], Any], None, None]:
+        self.wait()
+        # Only what's there now: records appended while this runs (by collectors being replayed, say) aren't included.
+        end = self.offset
+        segments = list(self.segments)
+        for i, segment in enumerate(segments):
+            following = segments[i + 1] if i + 1 < len(segments) else end
+            if following <= start or not os.path.exists(self.path(segment)):
+                continue
+            for index, _, payload in self.frames(segment):
+                offset = segment + index
+                if offset >= end:
+                    return
+                if offset < start:
+                    continue
+                uu, tags, data = self.loads(payload)
+                yield offset, uu, tags, data
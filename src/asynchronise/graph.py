@@ -0,0 +1,145 @@
+"""
+The static shape of a bus: which senders emit which tags, and which collectors those tags reach. Collectors only say
+what they accept, so senders have to declare what they emit (send(emits=[...])) for their edges to show up.
+"""
+
+import json
+from typing import TYPE_CHECKING, Any, Dict, Hashable, List, Set, Tuple
+
+if TYPE_CHECKING:
+    from .asynchronise import Asynchronise
+
+
+class PipelineGraph:
+    def __init__(self) -> None:
+        # node id -> kind: "sender", "collector", "tag", "type" or "wildcard". A function that both collects and sends is a collector.
+        self.nodes: Dict[str, str] = {}
+        self.edges: Set[Tuple[str, str]] = set()
+        # Names registered by more than one function; only the last one registered is actually used.
+        self.collisions: List[str] = []
+        # Groups of collectors that can trigger each other, as lists of names.
+        self.cycles: List[List[str]] = []
+        # Declared tags nothing subscribes to, and collectors no declared sender feeds.
+        self.dead_tags: List[str] = []
+        self.unfed: List[str] = []
+
+    def add(self, node: str, kind: str) -> str:
+        self.nodes.setdefault(node, kind)
+        return node
+
+    def successors(self) -> Dict[str, List[str]]:
+        following: Dict[str, List[str]] = {node: [] for node in self.nodes}
+        for a, b in sorted(self.edges):
+            following[a].append(b)
+        return following
+
+    def find_cycles(self) -> List[List[str]]:
+        # Tarjan's strongly connected components, iteratively so long chains don't hit the recursion limit. Only components containing a collector that can reach itself count.
+        following = self.successors()
+        index: Dict[str, int] = {}
+        low: Dict[str, int] = {}
+        stack: List[str] = []
+        on_stack: Set[str] = set()
+        components: List[List[str]] = []
+        for root in sorted(self.nodes):
+            if root in index:
+                continue
+            work = [(root, 0)]
+            while work:
+                node, i = work.pop()
+                if i == 0:
+                    index[node] = low[node] = len(index)
+                    stack.append(node)
+                    on_stack.add(node)
+                children = following[node]
+                if i < len(children):
+                    work.append((node, i + 1))
+                    child = children[i]
+                    if child not in index:
+                        work.append((child, 0))
+                    elif child in on_stack:
+                        low[node] = min(low[node], index[child])
+                    continue
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+        cycles = []
+        for component in components:
+            collectors = sorted(n for n in component if self.nodes[n] == "collector")
+            if not collectors:
+                continue
+            if len(component) > 1 or (component[0], component[0]) in self.edges:
+                cycles.append(collectors)
+        return cycles
+
+    def to_json(self, **kwargs: Any) -> str:
+        return json.dumps(
+            {
+                "nodes": [{"id": node, "kind": kind} for node, kind in sorted(self.nodes.items())],
+                "edges": sorted(self.edges),
+                "collisions": self.collisions,
+                "cycles": self.cycles,
+                "dead_tags": self.dead_tags,
+                "unfed": self.unfed,
+            },
+            **kwargs,
+        )
+
+    def to_dot(self) -> str:
+        shapes = {"sender": "box", "collector": "box", "tag": "ellipse", "type": "hexagon", "wildcard": "diamond"}
+        lines = ["digraph asynchronise {", "    rankdir=LR;"]
+        in_cycle = {name for cycle in self.cycles for name in cycle}
+        for node, kind in sorted(self.nodes.items()):
+            style = f'shape={shapes[kind]}'
+            if kind == "sender":
+                style += ", style=rounded"
+            if node in in_cycle:
+                style += ", color=red"
+            elif node in self.dead_tags or node in self.unfed:
+                style += ", color=gray"
+            lines.append(f"    {json.dumps(node)} [{style}];")
+        for a, b in sorted(self.edges):
+            lines.append(f"    {json.dumps(a)} -> {json.dumps(b)};")
+        lines.append("}")
+        return "\n".join(lines)
+
+
+def tag_node(tag: Hashable) -> str:
+    return f"tag:{tag}"
+
+
+def build_graph(bus: "Asynchronise") -> PipelineGraph:
+    graph = PipelineGraph()
+    for name, func_slot in bus.functions.items():
+        graph.add(name, "collector")
+        tags, types, wildcard = func_slot.dispatch_keys()
+        for tag in tags:
+            graph.edges.add((graph.add(tag_node(tag), "tag"), name))
+        for type_ in types:
+            graph.edges.add((graph.add(f"type:{type_.__qualname__}", "type"), name))
+        if wildcard:
+            graph.edges.add((graph.add("*", "wildcard"), name))
+    for name in bus.senders:
+        graph.add(name, "sender")
+        for tag in bus.emits.get(name, ()):
+            graph.edges.add((name, graph.add(tag_node(tag), "tag")))
+            if "*" in graph.nodes:
+                graph.edges.add((tag_node(tag), "*"))
+    graph.collisions = sorted(set(bus.collisions))
+    graph.cycles = graph.find_cycles()
+    subscribed = {a for a, _ in graph.edges if graph.nodes[a] == "tag"}
+    declared = {b for a, b in graph.edges if graph.nodes[b] == "tag"}
+    graph.dead_tags = sorted(declared - subscribed)
+    fed = {b for a, b in graph.edges if a in declared or a == "*"}
+    # Only meaningful once every sender declares what it emits; until then it's only a hint.
+    graph.unfed = sorted(n for n, kind in graph.nodes.items() if kind == "collector" and n not in fed)
+    return graph
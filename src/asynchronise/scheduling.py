@@ -0,0 +1,104 @@
+import asyncio
+import heapq
+import itertools
+import math
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from .asynchronise import Asynchronise, FunctionSlot
+
+
+class PriorityClass:
+    # Completions waiting for one of this class's workers, earliest deadline first (and in arrival order without one).
+    __slots__ = ("priority", "workers", "running", "queue")
+
+    def __init__(self, priority: int, workers: int) -> None:
+        self.priority = priority
+        self.workers = workers
+        self.running = 0
+        self.queue: List[Tuple[float, int, Tuple]] = []
+
+
+class Scheduler:
+    # Sits between matching and schedule_completion for collectors with a priority or a deadline. Every priority is a class of its own, with its own queue and at most `workers` completions running at once (`default_workers` for a class `workers` doesn't list). Higher priorities go first: a class only starts more of its work while every class above it has nothing queued, so a backlog of bulk work never delays the classes above it, and a class that's kept busy starves the ones below it. Work already running is never interrupted. Work that is still queued at its deadline goes to the collector's fallback, or is dropped without one.
+    def __init__(
+        self, bus: "Asynchronise", workers: Union[int, Dict[int, int]] = 16, default_workers: int = 16
+    ) -> None:
+        self.bus = bus
+        self.workers = workers
+        self.default_workers = default_workers
+        self.classes: Dict[int, PriorityClass] = {}
+        self._order = itertools.count()
+        # Resolved whenever a queue empties, for workers waiting on the classes above theirs.
+        self._emptied: Optional[asyncio.Future] = None
+
+    def workers_for(self, priority: int) -> int:
+        if isinstance(self.workers, dict):
+            return self.workers.get(priority, self.default_workers)
+        return self.workers
+
+    def outranked(self, cls: PriorityClass) -> bool:
+        return any(other.queue for other in self.classes.values() if other.priority > cls.priority)
+
+    # Returns a future that resolves once the completion has run (or expired).
+    def submit(self, func: Callable, kwargs: Dict[str, Any], uu: str, func_slot: "FunctionSlot") -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        deadline = None if func_slot.deadline is None else now + func_slot.deadline
+        priority = func_slot.priority or 0
+        cls = self.classes.get(priority)
+        if cls is None:
+            cls = self.classes[priority] = PriorityClass(priority, self.workers_for(priority))
+        # Stands in for the completion until a worker gets to it, so drain() and max_in_flight count it.
+        done = loop.create_future()
+        self.bus.track(done, uu)
+        heapq.heappush(
+            cls.queue,
+            (
+                math.inf if deadline is None else deadline,
+                next(self._order),
+                (func, kwargs, uu, func_slot, deadline, now, done),
+            ),
+        )
+        if cls.running < cls.workers:
+            cls.running += 1
+            self.bus.spawn(self.work(cls))
+        return done
+
+    async def work(self, cls: PriorityClass) -> None:
+        loop = asyncio.get_running_loop()
+        metrics = self.bus.metrics
+        try:
+            while cls.queue:
+                while self.outranked(cls):
+                    if self._emptied is None or self._emptied.done():
+                        self._emptied = loop.create_future()
+                    await self._emptied
+                if not cls.queue:
+                    break
+                _, _, (func, kwargs, uu, func_slot, deadline, queued, done) = heapq.heappop(cls.queue)
+                if not cls.queue and self._emptied is not None and not self._emptied.done():
+                    self._emptied.set_result(None)
+                try:
+                    now = loop.time()
+                    if metrics is not None:
+                        metrics.observe("scheduled_seconds", func.__name__, now - queued)
+                    if deadline is not None and now > deadline:
+                        if metrics is not None:
+                            metrics.count("expired", func.__name__)
+                        if func_slot.fallback is not None:
+                            await self.bus.schedule_completion(func_slot.fallback, kwargs, uu)
+                    else:
+                        await self.bus.schedule_completion(func, kwargs, uu, func_slot)
+                except Exception as e:
+                    # One failing completion shouldn't stop the worker from getting to the rest.
+                    loop.call_exception_handler(
+                        {"message": f"Exception in collector {func.__name__}", "exception": e}
+                    )
+                finally:
+                    done.set_result(None)
+        finally:
+            cls.running -= 1
+
+    def queued(self) -> Dict[int, int]:
+        return {priority: len(cls.queue) for priority, cls in self.classes.items()}
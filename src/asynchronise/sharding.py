@@ -0,0 +1,226 @@
+"""
+Runs copies of a bus in worker processes, one event loop each, and partitions root events between them by uuid.
+
+Collections only ever combine events that share a uuid, so as long as everything with the same uuid lands on the same
+shard the workers never need to talk to each other:
+
+    def build() -> Asynchronise:  # module level, so worker processes can import it
+        asyncer = Asynchronise()
+        ...register collectors...
+        return asyncer
+
+    sharded = ShardedAsynchronise(build, shards=4, forward={"newspaper_with_authors"})
+    async with sharded:
+        for headline in headlines:
+            await sharded.emit((Newspaper(headline), "newspaper_no_authors"))
+    async for event in sharded.results():
+        print(event.data)
+
+Events tagged with anything in `forward` (every event, if it's None) are sent back and come out of results(), which
+can be read while the shards run (from another task) or afterwards, and ends once the bus has been closed and every
+shard has drained. Data crossing a process boundary has to pickle, unless a PayloadArena is given as `transport`: then
+large buffers are placed in shared memory once, collectors on the shard see zero-copy views of them, and each segment
+is freed once the shard has finished everything under that event's uuid.
+"""
+
+import asyncio
+import functools
+import inspect
+import multiprocessing
+import os
+import zlib
+from typing import Any, AsyncGenerator, Callable, Hashable, Iterable, List, Optional
+
+from .asynchronise import Asynchronise, Event, get_uuid, iterate_in_thread, set_signature
+from .transport import PayloadArena, SharedPayload, detach, resolve
+
+
+def shard_of(uu: str, shards: int) -> int:
+    # Python's own str hash is salted per process; crc32 gives the same answer everywhere.
+    return zlib.crc32(uu.encode()) % shards
+
+
+def run_shard(
+    factory: Callable[[], Asynchronise],
+    shard: int,
+    inbox: Any,
+    outbox: Any,
+    forward: Optional[frozenset],
+) -> None:
+    try:
+        asyncio.run(serve_shard(factory, inbox, outbox, forward))
+    except BaseException as e:
+        outbox.put(("error", shard, repr(e)))
+    finally:
+        outbox.put(("done", shard))
+
+
+async def serve_shard(
+    factory: Callable[[], Asynchronise], inbox: Any, outbox: Any, forward: Optional[frozenset]
+) -> None:
+    asyncer = factory()
+
+    def send_back(event: Event) -> None:
+        if forward is None or not forward.isdisjoint(event.tag):
+            data = event.data
+            if isinstance(data, memoryview):
+                # Views onto shared payloads can't be pickled.
+                data = data.tobytes()
+            outbox.put(("event", event.uuid, data, tuple(event.tag)))
+
+    async def release_when_done(payload: SharedPayload, uu: str) -> None:
+        await asyncer.drain(uu)
+        detach(payload)
+        outbox.put(("release", payload.name))
+
+    asyncer.listeners.append(send_back)
+    loop = asyncio.get_running_loop()
+    releases = set()
+    while True:
+        message = await loop.run_in_executor(None, inbox.get)
+        if message is None:
+            break
+        obj, uu = message
+        payload = obj[0] if isinstance(obj, tuple) else obj
+        if isinstance(payload, SharedPayload):
+            view = resolve(payload)
+            obj = (view, *obj[1:]) if isinstance(obj, tuple) else view
+        await asyncer.emit(obj, uu)
+        # Don't keep the view alive past the uuid's cascade.
+        obj = view = None
+        if isinstance(payload, SharedPayload):
+            task = asyncio.create_task(release_when_done(payload, uu))
+            releases.add(task)
+            task.add_done_callback(releases.discard)
+    await asyncer.drain()
+    if releases:
+        await asyncio.wait(releases)
+
+
+class ShardedAsynchronise:
+    def __init__(
+        self,
+        factory: Callable[[], Asynchronise],
+        shards: Optional[int] = None,
+        forward: Optional[Iterable[Hashable]] = None,
+        context: Optional[Any] = None,
+        transport: Optional[PayloadArena] = None,
+    ) -> None:
+        self.factory = factory
+        self.shards = shards or os.cpu_count() or 1
+        self.forward = None if forward is None else frozenset(forward)
+        self.context = context or multiprocessing.get_context()
+        self.processes: List[Any] = []
+        self.inboxes: List[Any] = []
+        self.outbox: Any = None
+        self.errors: List[str] = []
+        self.transport = transport
+        self._results: Optional[asyncio.Queue] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._finished = object()
+
+    def start(self) -> None:
+        self.outbox = self.context.Queue()
+        self._results = asyncio.Queue()
+        for shard in range(self.shards):
+            inbox = self.context.Queue()
+            process = self.context.Process(
+                target=run_shard,
+                args=(self.factory, shard, inbox, self.outbox, self.forward),
+                daemon=True,
+            )
+            process.start()
+            self.inboxes.append(inbox)
+            self.processes.append(process)
+        self._reader = asyncio.create_task(self._read_outbox())
+
+    async def _read_outbox(self) -> None:
+        loop = asyncio.get_running_loop()
+        done = 0
+        try:
+            while done < self.shards:
+                message = await loop.run_in_executor(None, self.outbox.get)
+                if message[0] == "event":
+                    _, uu, data, tags = message
+                    self._results.put_nowait(Event(data, uu, tags))
+                elif message[0] == "release":
+                    self.transport.release(message[1])
+                elif message[0] == "error":
+                    self.errors.append(f"shard {message[1]}: {message[2]}")
+                else:
+                    done += 1
+        finally:
+            self._results.put_nowait(self._finished)
+
+    # Routes a root event to the shard that owns its uuid; a fresh uuid is made if none is given.
+    async def emit(self, obj: Any, uu: Optional[str] = None) -> str:
+        if uu is None:
+            uu = get_uuid()
+        if self.transport is not None:
+            if isinstance(obj, tuple):
+                obj = (self.transport.put(obj[0]), *obj[1:])
+            else:
+                obj = self.transport.put(obj)
+        self.inboxes[shard_of(uu, self.shards)].put((obj, uu))
+        return uu
+
+    # Like Asynchronise.send, but whatever the function yields or returns is routed to a shard rather than dispatched here. Every call gets one uuid, so everything it emits lands on the same shard.
+    def send(self, func: Callable) -> Callable:
+        async def async_generator_decorator(*args, **kwargs) -> Any:
+            uu = get_uuid(*args, **kwargs)
+            async for obj in func(*args, **kwargs):
+                await self.emit(obj, uu)
+                yield obj
+
+        async def sync_generator_decorator(*args, **kwargs) -> Any:
+            uu = get_uuid(*args, **kwargs)
+            async for obj in iterate_in_thread(func(*args, **kwargs)):
+                await self.emit(obj, uu)
+                yield obj
+
+        async def async_function_decorator(*args, **kwargs) -> Any:
+            uu = get_uuid(*args, **kwargs)
+            obj = await func(*args, **kwargs)
+            await self.emit(obj, uu)
+            return obj
+
+        async def sync_function_decorator(*args, **kwargs) -> Any:
+            uu = get_uuid(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            obj = await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+            await self.emit(obj, uu)
+            return obj
+
+        if inspect.isasyncgenfunction(func):
+            return set_signature(async_generator_decorator, func)
+        elif inspect.iscoroutinefunction(func):
+            return set_signature(async_function_decorator, func)
+        elif inspect.isgeneratorfunction(func):
+            return set_signature(sync_generator_decorator, func)
+        else:
+            return set_signature(sync_function_decorator, func)
+
+    async def results(self) -> AsyncGenerator[Event, None]:
+        while True:
+            event = await self._results.get()
+            if event is self._finished:
+                self._results.put_nowait(event)
+                return
+            yield event
+
+    # Tells every shard to finish what it has and stop, then waits for them. Results stay readable afterwards.
+    async def close(self) -> None:
+        for inbox in self.inboxes:
+            inbox.put(None)
+        if self._reader is not None:
+            await self._reader
+        loop = asyncio.get_running_loop()
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join)
+
+    async def __aenter__(self) -> "ShardedAsynchronise":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
@@ -0,0 +1,163 @@
+"""
+Sampled per-uuid tracing. For a sampled uuid, the bus records a span for every event it creates and every collector
+completion it runs. Each span remembers the span that caused it: an event's parent is the completion that emitted it,
+and a completion's parent is the event that completed its collection. Completions also record how long their
+collection waited for its last argument, and for collectors run in an executor, the time queued and the time running:
+
+    tracer = Tracer(sample_rate=0.01)
+    asyncer = Asynchronise(tracer=tracer)
+    ...
+    open("trace.json", "w").write(tracer.to_chrome())   # chrome://tracing or https://ui.perfetto.dev
+    open("trace.folded", "w").write(tracer.to_folded()) # flamegraph.pl, speedscope...
+
+Whether a uuid is sampled only depends on the uuid, so every hop of a request is traced or none of them are.
+"""
+
+import contextvars
+import itertools
+import json
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# The span whatever runs now was caused by; tasks inherit it from whoever started them.
+current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("uuid", "id", "parent", "kind", "name", "start", "end", "attrs")
+
+    def __init__(self, uuid: str, id: int, parent: Optional[int], kind: str, name: str, start: float) -> None:
+        self.uuid = uuid
+        self.id = id
+        self.parent = parent
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.end = start
+        self.attrs: Dict[str, Any] = {}
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.kind} {self.name} {self.duration:.6f}s>"
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = 0.01, max_traces: int = 1000) -> None:
+        self.sample_rate = sample_rate
+        self.max_traces = max_traces
+        # uuid -> its spans, oldest traces first so they're the ones dropped past max_traces.
+        self.traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        # (uuid, collector) -> how long its collection waited, from the match until the completion starts.
+        self.waits: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self.origin = time.perf_counter()
+        self._ids = itertools.count(1)
+
+    def sampled(self, uu: str) -> bool:
+        if self.sample_rate >= 1:
+            return True
+        return zlib.crc32(uu.encode()) < self.sample_rate * 2 ** 32
+
+    def record(self, span: Span) -> Span:
+        spans = self.traces.get(span.uuid)
+        if spans is None:
+            spans = self.traces[span.uuid] = []
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+        spans.append(span)
+        return span
+
+    # The parent for a new span of uu: whatever is current, as long as it belongs to the same uuid (a batch, say, starts a new one).
+    def parent(self, uu: str) -> Optional[int]:
+        span = current_span.get()
+        return span.id if span is not None and span.uuid == uu else None
+
+    def event(self, uu: str, tags: Any, sender: Optional[str]) -> Span:
+        name = ",".join(sorted(map(str, tags))) or "untagged"
+        span = Span(uu, next(self._ids), self.parent(uu), "event", name, time.perf_counter())
+        span.attrs["sender"] = sender
+        return self.record(span)
+
+    def matched(self, uu: str, collector: str, waited: float) -> None:
+        if not self.sampled(uu):
+            return
+        self.waits[uu, collector] = waited
+        while len(self.waits) > 10 * self.max_traces:
+            self.waits.popitem(last=False)
+
+    def start(self, uu: str, collector: str) -> Span:
+        span = Span(uu, next(self._ids), self.parent(uu), "completion", collector, time.perf_counter())
+        span.attrs["collection_wait"] = self.waits.pop((uu, collector), 0.0)
+        return self.record(span)
+
+    def finish(self, span: Span) -> None:
+        span.end = time.perf_counter()
+
+    def spans(self, uu: Optional[str] = None) -> List[Span]:
+        if uu is not None:
+            return list(self.traces.get(uu, ()))
+        return [span for spans in self.traces.values() for span in spans]
+
+    # The trace-event format Chrome's tracer and Perfetto read: one row per uuid, completions as slices, events as instants.
+    def to_chrome(self, **kwargs: Any) -> str:
+        events = []
+        for row, (uu, spans) in enumerate(self.traces.items(), 1):
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": row, "args": {"name": uu}})
+            for span in spans:
+                entry = {
+                    "name": span.name,
+                    "cat": span.kind,
+                    "ts": (span.start - self.origin) * 1e6,
+                    "pid": 1,
+                    "tid": row,
+                    "args": {"uuid": uu, "span": span.id, "parent": span.parent, **span.attrs},
+                }
+                if span.kind == "event":
+                    entry.update(ph="i", s="t")
+                else:
+                    entry.update(ph="X", dur=span.duration * 1e6)
+                events.append(entry)
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, **kwargs)
+
+    # Brendan Gregg's folded stacks, in microseconds, with each completion's stack running back through the events and completions that caused it. A completion's own frame only gets its self time: what's left after time queued for an executor worker (a [queued] frame under it) and the completions it ran nested inside itself (eager mode), which have frames of their own. Time a collection spent waiting for its last argument goes in a [collection wait: name] frame beside the completion, under the event that completed it.
+    def to_folded(self) -> str:
+        totals: Dict[str, int] = {}
+        for spans in self.traces.values():
+            by_id = {span.id: span for span in spans}
+            nested: Dict[int, float] = {}
+            for span in spans:
+                event = by_id.get(span.parent) if span.kind == "completion" and span.parent is not None else None
+                parent = by_id.get(event.parent) if event is not None and event.parent is not None else None
+                if parent is not None and parent.kind == "completion" and parent.start <= span.start and span.end <= parent.end:
+                    nested[parent.id] = nested.get(parent.id, 0.0) + span.duration
+            for span in spans:
+                if span.kind != "completion":
+                    continue
+                frames = []
+                node: Optional[Span] = by_id.get(span.parent) if span.parent is not None else None
+                while node is not None:
+                    frames.append(("emit " if node.kind == "event" else "") + node.name)
+                    node = by_id.get(node.parent) if node.parent is not None else None
+                parent_stack = ";".join(reversed(frames))
+                stack = parent_stack + ";" + span.name if parent_stack else span.name
+                waited = span.attrs.get("collection_wait", 0.0)
+                queued = span.attrs.get("queue_seconds", 0.0)
+                wait_frame = f"[collection wait: {span.name}]"
+                parts = [
+                    (parent_stack + ";" + wait_frame if parent_stack else wait_frame, waited),
+                    (stack + ";[queued]", queued),
+                    (stack, max(span.duration - queued - nested.get(span.id, 0.0), 0.0)),
+                ]
+                for key, seconds in parts:
+                    microseconds = int(seconds * 1e6)
+                    if microseconds > 0:
+                        totals[key] = totals.get(key, 0) + microseconds
+        return "\n".join(f"{stack} {value}" for stack, value in sorted(totals.items()))
+
+    def clear(self) -> None:
+        self.traces.clear()
+        self.waits.clear()
@@ -0,0 +1,180 @@
+"""
+Moves large buffers between processes through shared memory instead of pickling them.
+
+The sending process copies a buffer (bytes, bytearray, memoryview, array.array, NumPy arrays...) into a
+`multiprocessing.shared_memory` segment once and sends a small picklable SharedPayload handle in its place. Receivers
+map the same segment and get a memoryview (or an ndarray, for arrays) over it without copying. The arena that made a
+segment counts who is still using it and unlinks it when the last of them releases it:
+
+    arena = PayloadArena()
+    handle = arena.put(frame)          # a SharedPayload if frame is big enough, otherwise frame itself
+    ...in another process...
+    view = resolve(handle)             # zero-copy view onto the segment
+    detach(handle)                     # once done with the view
+    ...back in the first process...
+    arena.release(handle)
+"""
+
+import os
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class SharedPayload:
+    __slots__ = ("name", "size", "format", "shape", "dtype")
+
+    def __init__(
+        self,
+        name: str,
+        size: int,
+        format: str,
+        shape: Tuple[int, ...],
+        dtype: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.size = size
+        self.format = format
+        self.shape = shape
+        self.dtype = dtype
+
+    def __getstate__(self) -> Tuple:
+        return (self.name, self.size, self.format, self.shape, self.dtype)
+
+    def __setstate__(self, state: Tuple) -> None:
+        self.name, self.size, self.format, self.shape, self.dtype = state
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.name} {self.size} bytes>"
+
+
+# Segments this process has mapped, by name, so each is only attached once however many events point at it.
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+_lingering: List[shared_memory.SharedMemory] = []
+
+
+def resolve(obj: Any) -> Any:
+    if not isinstance(obj, SharedPayload):
+        return obj
+    segment = _attached.get(obj.name)
+    if segment is None:
+        # Workers share the arena process's resource tracker (see PayloadArena), so attaching here doesn't hand the segment to a tracker that would unlink it when this process exits.
+        segment = _attached[obj.name] = shared_memory.SharedMemory(name=obj.name)
+    if obj.dtype is not None:
+        return numpy.ndarray(obj.shape, dtype=numpy.dtype(obj.dtype), buffer=segment.buf)
+    view = segment.buf[: obj.size]
+    if obj.format != "B" or len(obj.shape) != 1:
+        view = view.cast(obj.format, obj.shape)
+    return view
+
+
+def detach(obj: Any) -> None:
+    if not isinstance(obj, SharedPayload):
+        return
+    segment = _attached.pop(obj.name, None)
+    if segment is None:
+        return
+    _lingering.append(segment)
+    for segment in list(_lingering):
+        try:
+            segment.close()
+        except BufferError:
+            # A view onto it is still alive somewhere; try again on the next detach.
+            continue
+        _lingering.remove(segment)
+
+
+class PayloadArena:
+    def __init__(self, threshold: int = 64 * 1024) -> None:
+        self.threshold = threshold
+        if os.name == "posix":
+            # Started before any worker process is, so they all inherit this one instead of starting their own.
+            from multiprocessing import resource_tracker
+
+            resource_tracker.ensure_running()
+        # name -> [segment, references, the original object]; holding the object keeps id(obj) from being reused while it's shared.
+        self.segments: Dict[str, List[Any]] = {}
+        # Shared bytes objects by id(obj).
+        self._by_id: Dict[int, SharedPayload] = {}
+
+    def put(self, obj: Any) -> Any:
+        if numpy is not None and isinstance(obj, numpy.ndarray):
+            if obj.nbytes < self.threshold or obj.dtype.hasobject:
+                return obj
+        else:
+            try:
+                view = memoryview(obj)
+            except TypeError:
+                return obj
+            if view.nbytes < self.threshold:
+                return obj
+        # bytes can't change, so one already shared for another receiver is counted rather than copied again. Anything mutable is copied on every put, since it may have been refilled since (hand a handle to more receivers with retain() instead).
+        immutable = type(obj) is bytes
+        if immutable:
+            handle = self._by_id.get(id(obj))
+            if handle is not None:
+                self.segments[handle.name][1] += 1
+                return handle
+        if numpy is not None and isinstance(obj, numpy.ndarray):
+            array = numpy.ascontiguousarray(obj)
+            segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            numpy.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+            handle = SharedPayload(segment.name, array.nbytes, "B", array.shape, array.dtype.str)
+        else:
+            view = memoryview(obj)
+            if not view.c_contiguous:
+                view = memoryview(view.tobytes()).cast(view.format, view.shape)
+            segment = shared_memory.SharedMemory(create=True, size=max(view.nbytes, 1))
+            segment.buf[: view.nbytes] = view.cast("B")
+            handle = SharedPayload(segment.name, view.nbytes, view.format, view.shape)
+        self.segments[handle.name] = [segment, 1, obj]
+        if immutable:
+            self._by_id[id(obj)] = handle
+        return handle
+
+    def retain(self, handle: Any, n: int = 1) -> None:
+        if isinstance(handle, SharedPayload):
+            self.segments[handle.name][1] += n
+
+    def release(self, handle: Any) -> None:
+        name = handle.name if isinstance(handle, SharedPayload) else handle
+        entry = self.segments.get(name)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        segment, _, obj = self.segments.pop(name)
+        self._by_id.pop(id(obj), None)
+        segment.unlink()
+        try:
+            segment.close()
+        except BufferError:
+            # Something here still holds a view; the mapping goes once that does, the name is already gone.
+            pass
+
+    def put_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: self.put(v) for k, v in kwargs.items()}
+
+    def release_kwargs(self, kwargs: Dict[str, Any]) -> None:
+        for v in kwargs.values():
+            if isinstance(v, SharedPayload):
+                self.release(v)
+
+    def close(self) -> None:
+        for name in list(self.segments):
+            self.segments[name][1] = 0
+            self.release(name)
+
+
+# Runs in the worker process: maps the shared arguments, calls the function, and lets go of the mappings again.
+def call_with_payloads(func: Callable, kwargs: Dict[str, Any]) -> Any:
+    try:
+        return func(**{k: resolve(v) for k, v in kwargs.items()})
+    finally:
+        for v in kwargs.values():
+            detach(v)
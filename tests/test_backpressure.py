@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from asynchronise.asynchronise import Asynchronise, iterate_in_thread
+
+
+def test_sync_generator_senders_leave_the_default_pool_to_collectors():
+    # More blocked sync-generator senders than the default pool has threads, with max_in_flight holding them back until the sync collector catches up.
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(5))
+        asyncer = Asynchronise(max_in_flight=4)
+        seen = []
+
+        @asyncer.collect({"item": (int, "item", None)})
+        def slow(item):
+            time.sleep(0.001)
+            seen.append(item)
+
+        @asyncer.send
+        def produce(start):
+            for i in range(start, start + 20):
+                yield i, "item"
+
+        async def run(start):
+            async for _ in produce(start):
+                pass
+
+        await asyncio.wait_for(asyncio.gather(*(run(20 * k) for k in range(6))), 10)
+        await asyncio.wait_for(asyncer.drain(), 10)
+        return seen
+
+    assert sorted(asyncio.run(main())) == list(range(120))
+
+
+def test_more_generator_senders_than_generator_threads():
+    # The senders' generators park whenever their buffers fill, so the generator collectors still get threads.
+    async def main():
+        asyncer = Asynchronise(max_in_flight=4, generator_threads=2)
+        seen = []
+
+        @asyncer.collect({"item": (int, "item", None)})
+        def slow(item):
+            time.sleep(0.001)
+            seen.append(item)
+            yield item
+
+        @asyncer.send
+        def produce(start):
+            for i in range(start, start + 20):
+                yield i, "item"
+
+        async def run(start):
+            async for _ in produce(start):
+                pass
+
+        await asyncio.wait_for(asyncio.gather(*(run(20 * k) for k in range(6))), 10)
+        await asyncio.wait_for(asyncer.drain(), 10)
+        return seen
+
+    assert sorted(asyncio.run(main())) == list(range(120))
+
+
+def test_generator_collectors_run_on_a_bounded_pool():
+    async def main():
+        asyncer = Asynchronise(generator_threads=4)
+        threads = set()
+
+        @asyncer.collect({"item": (int, "item", None)})
+        def spread(item):
+            threads.add(threading.current_thread().name)
+            time.sleep(0.0005)
+            yield item
+
+        for i in range(1000):
+            await asyncer.emit((i, "item"), f"u{i}")
+        await asyncer.drain()
+        return threads
+
+    threads = asyncio.run(main())
+    assert 0 < len(threads) <= 4
+    assert all(name.startswith("asynchronise-generator") for name in threads)
+
+
+def test_generator_collectors_honour_their_executor():
+    async def main():
+        asyncer = Asynchronise()
+        asyncer.executors["io"] = ThreadPoolExecutor(2, thread_name_prefix="io")
+        threads = set()
+
+        @asyncer.collect({"item": (int, "item", None)}, executor="io", max_concurrency=1)
+        def spread(item):
+            threads.add(threading.current_thread().name)
+            yield item
+
+        for i in range(20):
+            await asyncer.emit((i, "item"), f"u{i}")
+        await asyncer.drain()
+        return threads
+
+    threads = asyncio.run(main())
+    assert threads and all(name.startswith("io") for name in threads)
+
+
+def test_iterate_in_thread_closes_and_raises():
+    closed = threading.Event()
+
+    def numbers():
+        try:
+            for i in range(100):
+                yield i
+        finally:
+            closed.set()
+
+    def failing():
+        yield 1
+        raise ValueError("boom")
+
+    async def main():
+        with ThreadPoolExecutor(1) as pool:
+            taken = []
+            async for i in iterate_in_thread(numbers(), pool, buffer=2):
+                taken.append(i)
+                if i == 5:
+                    break
+            await asyncio.get_running_loop().run_in_executor(None, closed.wait, 5)
+            got = []
+            with pytest.raises(ValueError):
+                async for i in iterate_in_thread(failing(), pool):
+                    got.append(i)
+        return taken, got
+
+    taken, got = asyncio.run(main())
+    assert taken == list(range(6))
+    assert got == [1]
+    assert closed.is_set()
+
+
+def test_an_unknown_executor_name_is_reported():
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: failed.append(context))
+        asyncer = Asynchronise()
+        asyncer.executors["cpu"] = ThreadPoolExecutor(1)
+
+        @asyncer.collect({"item": (int, "item", None)}, executor="io")
+        def fetch(item):
+            pass
+
+        await asyncer.emit((1, "item"), "a")
+        await asyncer.drain()
+        asyncer.executors["cpu"].shutdown()
+
+    failed = []
+    asyncio.run(main())
+    assert len(failed) == 1
+    error = failed[0]["exception"]
+    assert isinstance(error, ValueError)
+    assert "fetch" in str(error) and "'io'" in str(error) and "'cpu'" in str(error)
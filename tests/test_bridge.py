@@ -0,0 +1,70 @@
+import asyncio
+
+from asynchronise.asynchronise import Asynchronise
+from asynchronise.bridge import Bridge
+
+
+async def eventually(condition, timeout=5.0):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.005)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_buses_over_a_unix_socket(tmp_path):
+    async def main():
+        upstream = Asynchronise(name="upstream", metrics=True)
+        worker = Asynchronise(name="worker", metrics=True)
+        got, upstream_shared, worker_shared = [], [], []
+
+        @worker.send
+        @worker.collect({"raw": (None, "raw", None)})
+        def heavy(raw):
+            return raw * 10, "cooked"
+
+        @upstream.collect({"cooked": (None, "cooked", None)})
+        def sink(cooked):
+            got.append(cooked)
+
+        # Both sides subscribe to "shared", so an event that bounced would be seen twice.
+        @upstream.collect({"shared": (None, "shared", None)})
+        def upstream_sink(shared):
+            upstream_shared.append(shared)
+
+        @worker.collect({"shared": (None, "shared", None)})
+        def worker_sink(shared):
+            worker_shared.append(shared)
+
+        path = str(tmp_path / "bus.sock")
+        async with Bridge(upstream) as server, Bridge(worker) as client:
+            await server.serve_unix(path)
+            peer = await client.connect_unix(path)
+            assert peer.name == "upstream"
+            assert await client.connect_unix(path) is peer
+            await eventually(lambda: server.peers and server.peers[0].ready.is_set())
+
+            for i in range(10):
+                await upstream.emit((i, "raw"), f"r{i}")
+                await upstream.emit((i, "unrelated"), f"n{i}")
+            for i in range(3):
+                await worker.emit((i, "shared"), f"s{i}")
+            await upstream.drain()
+            await server.flush()
+            await eventually(lambda: len(got) == 10 and len(upstream_shared) == 3)
+            await worker.drain()
+            await client.flush()
+            await asyncio.sleep(0.05)
+            await upstream.drain()
+            await server.flush()
+            await asyncio.sleep(0.05)
+        return got, upstream_shared, worker_shared, worker.stats()["events"]
+
+    cooked, upstream_shared, worker_shared, worker_events = asyncio.run(main())
+    assert sorted(cooked) == [i * 10 for i in range(10)]
+    # Only tags the worker's collectors subscribe to were sent to it.
+    assert worker_events["raw"] == 10
+    assert "unrelated" not in worker_events
+    # Events that came from the worker weren't forwarded back to it.
+    assert sorted(upstream_shared) == [0, 1, 2]
+    assert sorted(worker_shared) == [0, 1, 2]
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import threading
+import time
+
+from asynchronise.asynchronise import Asynchronise
+from asynchronise.caching import DiskCache, MemoryCache, cache_key
+
+
+def test_cache_keys():
+    assert cache_key(len, {"a": 1, "b": 2}) == cache_key(len, {"b": 2, "a": 1})
+    assert cache_key(len, {"a": 1}) != cache_key(len, {"a": 2})
+    assert cache_key(len, {"a": 1}) != cache_key(abs, {"a": 1})
+    assert cache_key(len, {"a": threading.Lock()}) is None
+
+
+def test_memory_cache_evicts_the_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", [1])
+    cache.set("b", [2])
+    assert cache.get("a") == [1]
+    cache.set("c", [3])
+    assert cache.get("b") is None
+    assert cache.get("a") == [1]
+    assert cache.get("c") == [3]
+
+
+def test_memory_cache_ttl():
+    cache = MemoryCache(ttl=0.01)
+    cache.set("a", [1])
+    assert cache.get("a") == [1]
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert "a" not in cache.entries
+
+
+def test_disk_cache_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl=60)
+    cache.set("ab" * 32, [1, "two", (3,)])
+    assert DiskCache(str(tmp_path)).get("ab" * 32) == [1, "two", (3,)]
+    assert cache.get("cd" * 32) is None
+    # Outputs that don't pickle just aren't stored.
+    cache.set("ef" * 32, [threading.Lock()])
+    assert cache.get("ef" * 32) is None
+    old = time.time() - 120
+    os.utime(cache.path("ab" * 32), (old, old))
+    assert cache.get("ab" * 32) is None
+    cache.set("ab" * 32, [1])
+    cache.clear()
+    assert cache.get("ab" * 32) is None
+
+
+def test_hits_re_emit_generator_outputs_under_the_new_uuid():
+    async def main():
+        asyncer = Asynchronise(metrics=True)
+        calls, seen = [], []
+
+        @asyncer.send
+        @asyncer.collect({"word": (str, "word", None)}, cache=True)
+        def letters(word):
+            calls.append(word)
+            for letter in word[:2]:
+                yield letter, "letter"
+
+        @asyncer.collect({"letter": (str, "letter", None)})
+        async def record(letter: str):
+            seen.append((asyncio.current_task().get_name(), letter))
+
+        original = asyncer.spawn
+
+        def spawn(coro, uu=None):
+            task = original(coro, uu)
+            task.set_name(uu)
+            return task
+
+        asyncer.spawn = spawn
+        await asyncer.emit(("hello", "word"), "a")
+        await asyncer.drain()
+        await asyncer.emit(("hello", "word"), "b")
+        await asyncer.drain()
+        return calls, seen, asyncer.stats()
+
+    calls, seen, stats = asyncio.run(main())
+    assert calls == ["hello"]
+    assert sorted(seen) == [("a", "e"), ("a", "h"), ("b", "e"), ("b", "h")]
+    assert stats["cache_hits"] == {"letters": 1}
+    assert stats["cache_misses"] == {"letters": 1}
+
+
+def test_concurrent_misses_share_one_computation():
+    async def main():
+        asyncer = Asynchronise()
+        calls, seen = [], []
+
+        @asyncer.send
+        @asyncer.collect({"n": (int, "n", None)}, cache=True)
+        async def square(n):
+            calls.append(n)
+            await asyncio.sleep(0.01)
+            return n * n, "square"
+
+        @asyncer.collect({"square": (int, "square", None)})
+        def record(square):
+            seen.append(square)
+
+        for uu in "abc":
+            await asyncer.emit((3, "n"), uu)
+        await asyncer.drain()
+        return calls, seen
+
+    calls, seen = asyncio.run(main())
+    assert calls == [3]
+    assert seen == [9, 9, 9]
+
+
+def test_a_failed_computation_lets_waiters_retry():
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: failed.append(context))
+        asyncer = Asynchronise()
+        calls, seen = [], []
+
+        @asyncer.send
+        @asyncer.collect({"n": (int, "n", None)}, cache=True)
+        async def flaky(n):
+            calls.append(n)
+            await asyncio.sleep(0.01)
+            if len(calls) == 1:
+                raise ValueError(n)
+            return n, "done"
+
+        @asyncer.collect({"done": (int, "done", None)})
+        def record(done):
+            seen.append(done)
+
+        await asyncer.emit((1, "n"), "a")
+        await asyncer.emit((1, "n"), "b")
+        await asyncer.drain()
+        return calls, seen, asyncer.functions["flaky"]
+
+    failed = []
+    calls, seen, func_slot = asyncio.run(main())
+    assert calls == [1, 1]
+    assert seen == [1]
+    assert len(failed) == 1
+    assert func_slot.computing == {}
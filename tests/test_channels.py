@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from asynchronise.asynchronise import Asynchronise
+from asynchronise.channels import SubscriptionClosed
+
+
+def test_drop_oldest_keeps_the_newest_events():
+    async def main():
+        asyncer = Asynchronise()
+        subscription = asyncer.subscribe("x", maxsize=3)
+        for i in range(5):
+            await asyncer.emit((i, "x"), f"u{i}")
+        await asyncer.drain()
+        return [event.data for event in await subscription.get_many()], subscription.dropped
+
+    assert asyncio.run(main()) == ([2, 3, 4], 2)
+
+
+def test_iteration_ends_once_closed_and_emptied():
+    async def main():
+        asyncer = Asynchronise()
+        subscription = asyncer.subscribe("x", batch=2)
+        for i in range(5):
+            await asyncer.emit((i, "x"), f"u{i}")
+        await asyncer.drain()
+        subscription.close()
+        return [[event.data for event in batch] async for batch in subscription]
+
+    assert asyncio.run(main()) == [[0, 1], [2, 3], [4]]
+
+
+def test_get_on_a_closed_subscription_raises_subscription_closed():
+    async def main():
+        asyncer = Asynchronise()
+        subscription = asyncer.subscribe("x")
+
+        # get() inside an async generator: a StopAsyncIteration escaping it would become a RuntimeError.
+        async def values():
+            while True:
+                event = await subscription.get()
+                yield event.data
+
+        await asyncer.emit((1, "x"), "u")
+        await asyncer.drain()
+        subscription.close()
+        seen = []
+        with pytest.raises(SubscriptionClosed):
+            async for value in values():
+                seen.append(value)
+        return seen
+
+    assert asyncio.run(main()) == [1]
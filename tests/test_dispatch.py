@@ -0,0 +1,127 @@
+import asyncio
+from collections.abc import Mapping
+from typing import Protocol, runtime_checkable
+
+import pytest
+
+from asynchronise.asynchronise import Asynchronise, DispatchIndex, Event, indexable_type
+
+
+@runtime_checkable
+class HasName(Protocol):
+    name: str
+
+
+class Named:
+    def __init__(self, name):
+        self.name = name
+
+
+class Base:
+    pass
+
+
+class Derived(Base):
+    pass
+
+
+def test_indexable_types():
+    assert indexable_type(int)
+    assert indexable_type(Base)
+    assert indexable_type(Mapping)
+    assert not indexable_type(HasName)
+
+
+def test_events_only_visit_their_subscribers():
+    asyncer = Asynchronise()
+
+    @asyncer.collect({"a": (None, "a", None)})
+    def on_a(a):
+        pass
+
+    @asyncer.collect({"base": (Base, None, None)})
+    def on_base(base):
+        pass
+
+    @asyncer.collect({"anything": (None, None, None)})
+    def on_anything(anything):
+        pass
+
+    index = asyncer.index
+    assert isinstance(index, DispatchIndex)
+    names = lambda event: sorted(slot.func.__name__ for slot in index.candidates(event))
+    assert names(Event(1, "u", frozenset({"a"}))) == ["on_a", "on_anything"]
+    assert names(Event(Derived(), "u", frozenset())) == ["on_anything", "on_base"]
+    assert names(Event(1, "u", frozenset({"b"}))) == ["on_anything"]
+
+
+def test_protocol_conditions_are_checked_with_isinstance():
+    async def main():
+        asyncer = Asynchronise()
+        named, tagged = [], []
+
+        @asyncer.collect({"thing": (HasName, None, None)})
+        def on_named(thing):
+            named.append(thing.name)
+
+        @asyncer.collect({"a": (None, "a", None)})
+        def on_a(a):
+            tagged.append(a)
+
+        await asyncer.emit(Named("x"), "u1")
+        await asyncer.emit((1, "a"), "u2")
+        await asyncer.emit(3, "u3")
+        await asyncer.drain()
+        return named, tagged
+
+    assert asyncio.run(main()) == (["x"], [1])
+
+
+def collect_with_a_failing_predicate(asyncer, seen, failed):
+    asyncio.get_running_loop().set_exception_handler(lambda loop, context: failed.append(context["exception"]))
+
+    @asyncer.collect({"n": (None, "n", lambda event: 1 / event.data > 0)})
+    def picky(n):
+        pass
+
+    @asyncer.collect({"n": (None, "n", None)})
+    def everything(n):
+        seen.append(n)
+
+
+@pytest.mark.parametrize("eager", [False, True])
+def test_a_raising_predicate_only_fails_its_own_slot(eager):
+    async def main():
+        asyncer = Asynchronise(eager=eager)
+        seen, failed, sent = [], [], []
+        collect_with_a_failing_predicate(asyncer, seen, failed)
+
+        @asyncer.send
+        async def numbers():
+            for n in (1, 0, 2):
+                yield n, "n"
+
+        async for n, _ in numbers():
+            sent.append(n)
+        await asyncer.drain()
+        return seen, failed, sent
+
+    seen, failed, sent = asyncio.run(main())
+    assert sent == [1, 0, 2]
+    assert sorted(seen) == [0, 1, 2]
+    assert [type(e) for e in failed] == [ZeroDivisionError]
+
+
+def test_deliver_contains_raising_predicates():
+    async def main():
+        asyncer = Asynchronise()
+        seen, failed = [], []
+        collect_with_a_failing_predicate(asyncer, seen, failed)
+        for i, n in enumerate((1, 0, 2)):
+            asyncer.deliver(Event(n, f"u{i}", frozenset({"n"})))
+        await asyncer.drain()
+        return seen, failed
+
+    seen, failed = asyncio.run(main())
+    assert sorted(seen) == [0, 1, 2]
+    assert [type(e) for e in failed] == [ZeroDivisionError]
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from asynchronise import eventlog
+from asynchronise.asynchronise import Asynchronise
+from asynchronise.eventlog import EventLog
+
+
+def test_records_round_trip_across_segments(tmp_path):
+    log = EventLog(str(tmp_path), segment_bytes=200, sync_every=3)
+    for i in range(20):
+        log.append(f"u{i}", ("a",), i)
+    log.close()
+    assert len(os.listdir(tmp_path)) > 1
+    reopened = EventLog(str(tmp_path))
+    assert reopened.offset == 20
+    assert [(offset, data) for offset, _, _, data in reopened.records(5)] == [(i, i) for i in range(5, 20)]
+    reopened.close()
+
+
+def test_a_torn_record_is_cut_off_on_reopen(tmp_path):
+    log = EventLog(str(tmp_path))
+    log.append("u", ("a",), 1)
+    log.close()
+    with open(os.path.join(tmp_path, eventlog.segment_name(0)), "ab") as f:
+        f.write(b"\x10\x00\x00\x00garb")
+    reopened = EventLog(str(tmp_path))
+    assert reopened.offset == 1
+    assert [data for _, _, _, data in reopened.records()] == [1]
+    reopened.close()
+
+
+def test_writes_and_fsyncs_happen_off_the_calling_thread(tmp_path, monkeypatch):
+    threads = []
+    fsync = os.fsync
+
+    def recording_fsync(fd):
+        threads.append(threading.current_thread())
+        fsync(fd)
+
+    monkeypatch.setattr(eventlog.os, "fsync", recording_fsync)
+    log = EventLog(str(tmp_path), sync_every=1)
+    log.append("u", ("a",), 1)
+    log.close()
+    assert threads and threading.current_thread() not in threads
+
+
+@pytest.mark.parametrize("eager", [False, True])
+def test_unserializable_events_are_skipped_but_still_dispatched(tmp_path, eager):
+    async def main():
+        log = EventLog(str(tmp_path))
+        asyncer = Asynchronise(log=log, eager=eager)
+        seen = []
+
+        @asyncer.collect({"lock": (None, "lock", None)})
+        def take(lock):
+            seen.append(lock)
+
+        await asyncer.emit((threading.Lock(), "lock"), "u")
+        await asyncer.emit((1, "lock"), "v")
+        await asyncer.drain()
+        log.close()
+        return seen, log
+
+    seen, log = asyncio.run(main())
+    assert len(seen) == 2
+    assert log.skipped == 1
+    assert log.offset == 1
+
+
+def test_replay_runs_new_collectors_over_old_traffic(tmp_path):
+    async def record():
+        log = EventLog(str(tmp_path))
+        async with Asynchronise(log=log) as asyncer:
+            for i in range(10):
+                await asyncer.emit((i, "a"), f"u{i}")
+        log.close()
+
+    async def replay():
+        asyncer = Asynchronise()
+        seen = []
+
+        @asyncer.collect({"a": (None, "a", None)})
+        def report(a):
+            seen.append(a)
+
+        log = EventLog(str(tmp_path))
+        replayed = await asyncer.replay(log)
+        await asyncer.drain()
+        log.close()
+        return replayed, seen
+
+    asyncio.run(record())
+    replayed, seen = asyncio.run(replay())
+    assert replayed == 10
+    assert sorted(seen) == list(range(10))
+
+
+def test_a_quiet_spell_still_gets_written(tmp_path):
+    async def main():
+        log = EventLog(str(tmp_path), sync_interval=0.02)
+        asyncer = Asynchronise(log=log)
+        for i in range(5):
+            await asyncer.emit((i, "a"), f"u{i}")
+        await asyncer.drain()
+        await asyncio.sleep(0.1)
+        await asyncio.get_running_loop().run_in_executor(None, log.written.result)
+        return log
+
+    log = asyncio.run(main())
+    assert log.pending == 0
+    assert os.path.getsize(tmp_path / eventlog.segment_name(0)) > 0
+    log.close()
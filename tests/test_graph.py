@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from asynchronise.asynchronise import Asynchronise
+from asynchronise.eventlog import EventLog
+from asynchronise.graph import build_graph
+
+
+def counting_events(asyncer):
+    created = []
+    create_event = asyncer.create_event
+
+    def counting(obj, uu, sender=None):
+        created.append(obj)
+        return create_event(obj, uu, sender)
+
+    asyncer.create_event = counting
+    return created
+
+
+def test_a_collector_feeding_itself_is_a_cycle():
+    asyncer = Asynchronise()
+
+    @asyncer.send(emits=["n"])
+    @asyncer.collect({"n": (int, "n", None)})
+    def countdown(n):
+        if n:
+            return n - 1, "n"
+
+    graph = build_graph(asyncer)
+    assert ("tag:n", "countdown") in graph.edges
+    assert ("countdown", "tag:n") in graph.edges
+    assert graph.cycles == [["countdown"]]
+    with pytest.raises(ValueError, match="countdown"):
+        asyncer.compile()
+    assert asyncer.compile(allow_cycles=True).cycles == [["countdown"]]
+
+
+def test_two_collectors_triggering_each_other_are_one_cycle():
+    asyncer = Asynchronise()
+
+    @asyncer.send(emits=["pong"])
+    @asyncer.collect({"ball": (None, "ping", None)})
+    def ping(ball):
+        return ball, "pong"
+
+    @asyncer.send(emits=["ping"])
+    @asyncer.collect({"ball": (None, "pong", None)})
+    def pong(ball):
+        return ball, "ping"
+
+    @asyncer.send(emits=["ping", "score"])
+    @asyncer.collect({"ball": (None, "serve", None)})
+    def serve(ball):
+        return ball, "ping"
+
+    graph = build_graph(asyncer)
+    assert graph.cycles == [["ping", "pong"]]
+    assert graph.dead_tags == ["tag:score"]
+    assert graph.unfed == ["serve"]
+    with pytest.raises(ValueError, match="ping -> pong"):
+        asyncer.compile()
+
+
+def test_a_duplicate_name_is_a_collision():
+    asyncer = Asynchronise()
+
+    def make(tag):
+        @asyncer.collect({"x": (None, tag, None)})
+        def handler(x):
+            pass
+
+    make("a")
+    make("b")
+    graph = build_graph(asyncer)
+    assert graph.collisions == ["handler"]
+    assert ("tag:b", "handler") in graph.edges
+    assert "tag:a" not in graph.nodes
+    with pytest.raises(ValueError, match="handler"):
+        asyncer.compile()
+
+
+def test_compiled_bus_skips_events_nobody_subscribes_to():
+    async def main():
+        asyncer = Asynchronise(metrics=True)
+        seen = []
+
+        @asyncer.collect({"a": (None, "a", None)})
+        def record(a):
+            seen.append(a)
+
+        created = counting_events(asyncer)
+        asyncer.compile()
+        await asyncer.emit((1, "a"), "u")
+        await asyncer.emit((2, "b"), "u")
+        await asyncer.drain()
+        return seen, created, asyncer.stats()
+
+    seen, created, stats = asyncio.run(main())
+    assert seen == [1]
+    assert created == [(1, "a")]
+    assert stats["elided"] == {"b": 1}
+
+
+@pytest.mark.parametrize("watcher", ["listener", "log", "type", "wildcard"])
+def test_nothing_is_elided_while_something_sees_every_event(watcher, tmp_path):
+    async def main():
+        log = EventLog(str(tmp_path)) if watcher == "log" else None
+        asyncer = Asynchronise(log=log)
+        seen = []
+
+        @asyncer.collect({"a": (None, "a", None)})
+        def record(a):
+            pass
+
+        if watcher == "listener":
+            asyncer.listeners.append(lambda event: seen.append(event.data))
+        elif watcher == "type":
+            @asyncer.collect({"n": (int, None, None)})
+            def numbers(n):
+                seen.append(n)
+        elif watcher == "wildcard":
+            @asyncer.collect({"anything": (None, None, None)})
+            def anything(anything):
+                seen.append(anything)
+
+        created = counting_events(asyncer)
+        asyncer.compile()
+        await asyncer.emit((2, "b"), "u")
+        await asyncer.drain()
+        if log is not None:
+            log.close()
+            reopened = EventLog(str(tmp_path))
+            seen.extend(data for _, _, _, data in reopened.records())
+            reopened.close()
+        return seen, created
+
+    seen, created = asyncio.run(main())
+    assert created == [(2, "b")]
+    assert seen == [2]
@@ -0,0 +1,96 @@
+import asyncio
+
+from asynchronise.asynchronise import Asynchronise, sliding, tumbling
+
+
+class Tick:
+    def __init__(self, symbol, price):
+        self.symbol = symbol
+        self.price = price
+
+
+class Quote:
+    def __init__(self, symbol, bid):
+        self.symbol = symbol
+        self.bid = bid
+
+
+def run(events, **options):
+    # Emits (value, tag) pairs, or pauses for a float's worth of seconds, and returns the (price, bid) pairs joined.
+    async def main():
+        asyncer = Asynchronise(eager=True)
+        joined = []
+
+        @asyncer.collect(
+            {"tick": (Tick, "tick", None), "quote": (Quote, "quote", None)},
+            join_key=lambda event: event.symbol,
+            **options,
+        )
+        async def join(tick, quote):
+            joined.append((tick.price, quote.bid))
+
+        for i, event in enumerate(events):
+            if isinstance(event, float):
+                await asyncio.sleep(event)
+            else:
+                await asyncer.emit(event, f"u{i}")
+        await asyncer.drain()
+        return joined, asyncer
+
+    return asyncio.run(main())
+
+
+def test_joins_without_a_window_use_the_latest_values():
+    joined, _ = run(
+        [(Quote("A", 1), "quote"), (Tick("A", 10), "tick"), (Tick("B", 20), "tick"), (Tick("A", 11), "tick"), (Quote("B", 2), "quote")]
+    )
+    assert joined == [(10, 1), (11, 1), (20, 2)]
+
+
+def test_sliding_count_window():
+    joined, _ = run(
+        [(Quote("A", 1), "quote"), (Tick("A", 10), "tick"), (Tick("A", 11), "tick"), (Quote("A", 2), "quote")],
+        window=sliding(count=2),
+    )
+    # The third event of A is more than two events after its quote.
+    assert joined == [(10, 1), (11, 2)]
+
+
+def test_sliding_time_window():
+    joined, _ = run(
+        [(Quote("A", 1), "quote"), 0.05, (Tick("A", 10), "tick"), (Quote("A", 2), "quote")],
+        window=sliding(seconds=0.02),
+    )
+    assert joined == [(10, 2)]
+
+
+def test_tumbling_count_window():
+    joined, _ = run(
+        [(Quote("A", 1), "quote"), (Tick("A", 10), "tick"), (Tick("A", 11), "tick"), (Quote("A", 2), "quote"), (Tick("A", 12), "tick")],
+        window=tumbling(count=2),
+    )
+    assert joined == [(10, 1), (11, 2)]
+
+
+def test_tumbling_time_window():
+    joined, _ = run(
+        [(Quote("A", 1), "quote"), 0.05, (Tick("A", 10), "tick"), (Quote("A", 2), "quote")],
+        window=tumbling(seconds=0.02),
+    )
+    assert joined == [(10, 2)]
+
+
+def test_keys_are_dropped_once_their_time_window_has_passed():
+    events = [(Tick(str(i), i), "tick") for i in range(1000)]
+    _, asyncer = run(events, window=0.01)
+    asyncio.run(asyncio.sleep(0.03))
+    asyncer.expire()
+    assert asyncer.stats()["pending"]["join"] == 0
+
+
+def test_an_explicit_max_age_wins_over_the_window():
+    events = [(Tick(str(i), i), "tick") for i in range(10)]
+    _, asyncer = run(events, window=0.01, max_age=60)
+    asyncio.run(asyncio.sleep(0.03))
+    asyncer.expire()
+    assert asyncer.stats()["pending"]["join"] == 10
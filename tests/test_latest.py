@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from asynchronise.asynchronise import Asynchronise
+
+
+@pytest.mark.parametrize("eager", [False, True])
+def test_conflation_keeps_only_the_newest_waiting_value(eager):
+    async def main():
+        asyncer = Asynchronise(eager=eager, metrics=True)
+        seen = []
+
+        @asyncer.collect({"pos": (None, "pos", None)}, conflate=lambda kwargs: "all")
+        async def redraw(pos):
+            seen.append(pos)
+            await asyncio.sleep(0.01)
+
+        for i in range(10):
+            await asyncer.emit((i, "pos"), f"u{i}")
+        await asyncer.drain()
+        return seen, asyncer
+
+    seen, asyncer = asyncio.run(main())
+    assert seen == [0, 9]
+    assert asyncer.stats()["conflated"] == {"redraw": 8}
+    assert asyncer.functions["redraw"].latest == {}
+    assert asyncer.in_flight == 0
+
+
+def test_drain_of_a_uuid_waits_for_its_conflated_completion():
+    async def main():
+        asyncer = Asynchronise()
+        seen = []
+
+        @asyncer.collect({"pos": (None, "pos", None)}, conflate=lambda kwargs: "all")
+        async def redraw(pos):
+            await asyncio.sleep(0.01)
+            seen.append(pos)
+
+        await asyncer.emit((0, "pos"), "a")
+        await asyncer.drain("a")
+        await asyncer.emit((1, "pos"), "a")
+        await asyncio.sleep(0)
+        # Waits behind a's completion, under b's uuid.
+        await asyncer.emit((2, "pos"), "b")
+        await asyncer.drain("b")
+        after_b = list(seen)
+        await asyncer.drain()
+        return after_b
+
+    assert asyncio.run(main()) == [0, 1, 2]
+
+
+@pytest.mark.parametrize("eager", [False, True])
+def test_debounce_only_passes_the_last_of_a_burst(eager):
+    async def main():
+        asyncer = Asynchronise(eager=eager, metrics=True)
+        saved = []
+
+        @asyncer.collect({"pos": (None, "pos", None)}, debounce={"pos": 0.02})
+        async def save(pos):
+            saved.append(pos)
+
+        for i in range(5):
+            await asyncer.emit((i, "pos"), "u")
+        # drain() waits for the held event too.
+        await asyncer.drain("u")
+        first = list(saved)
+        await asyncer.emit((5, "pos"), "u")
+        await asyncer.drain()
+        return first, saved, asyncer
+
+    first, saved, asyncer = asyncio.run(main())
+    assert first == [4]
+    assert saved == [4, 5]
+    assert asyncer.stats()["debounced"] == {"save": 4}
+    assert asyncer.functions["save"].held == {}
+
+
+def test_a_failing_conflated_completion_still_starts_the_next():
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: failed.append(context))
+        asyncer = Asynchronise()
+        seen = []
+
+        @asyncer.collect({"pos": (None, "pos", None)}, conflate=lambda kwargs: "all")
+        async def redraw(pos):
+            seen.append(pos)
+            await asyncio.sleep(0.01)
+            if pos == 0:
+                raise ValueError(pos)
+
+        for i in range(3):
+            await asyncer.emit((i, "pos"), f"u{i}")
+        await asyncio.wait_for(asyncer.drain(), 5)
+        return seen, asyncer
+
+    failed = []
+    seen, asyncer = asyncio.run(main())
+    assert seen == [0, 2]
+    assert asyncer.functions["redraw"].latest == {}
+    assert len(failed) == 1
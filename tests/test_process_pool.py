@@ -0,0 +1,31 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+from asynchronise.asynchronise import Asynchronise
+
+asyncer = Asynchronise()
+results = []
+
+
+# Collects in a process pool and sends what it returns, so the name `heavy` is bound to the @send wrapper.
+@asyncer.send
+@asyncer.collect({"n": (int, "number", None)}, executor="processes")
+def heavy(n):
+    return sum(i * i for i in range(n)), "squares"
+
+
+@asyncer.collect({"squares": (int, "squares", None)})
+def record(squares):
+    results.append(squares)
+
+
+def test_sending_collector_runs_in_a_process_pool():
+    async def main():
+        with ProcessPoolExecutor(2) as pool:
+            asyncer.executors["processes"] = pool
+            await asyncer.emit((10, "number"), "a")
+            await asyncer.emit((20, "number"), "b")
+            await asyncer.drain()
+
+    asyncio.run(main())
+    assert sorted(results) == [285, 2470]
@@ -0,0 +1,81 @@
+import asyncio
+
+from asynchronise.asynchronise import Asynchronise
+
+
+def test_higher_priorities_start_first():
+    async def main():
+        asyncer = Asynchronise(workers=1)
+        started = []
+
+        @asyncer.collect({"bulk": (None, "bulk", None)}, priority=0)
+        async def bulk(bulk):
+            started.append(("bulk", bulk))
+            await asyncio.sleep(0.001)
+
+        @asyncer.collect({"urgent": (None, "urgent", None)}, priority=10)
+        async def urgent(urgent):
+            started.append(("urgent", urgent))
+            await asyncio.sleep(0.001)
+
+        for i in range(5):
+            await asyncer.emit((i, "bulk"), f"b{i}")
+        for i in range(5):
+            await asyncer.emit((i, "urgent"), f"u{i}")
+        await asyncer.drain()
+        return started
+
+    started = asyncio.run(main())
+    assert len(started) == 10
+    # Only bulk work that had started before anything urgent was queued can come first.
+    first_urgent = started.index(("urgent", 0))
+    assert first_urgent <= 1
+    assert [kind for kind, _ in started[first_urgent : first_urgent + 5]] == ["urgent"] * 5
+
+
+def test_default_workers_bounds_unlisted_classes():
+    async def main():
+        asyncer = Asynchronise(workers={10: 4}, default_workers=2)
+        running = 0
+        most = 0
+
+        @asyncer.collect({"job": (None, "job", None)}, priority=3)
+        async def job(job):
+            nonlocal running, most
+            running += 1
+            most = max(most, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+
+        for i in range(10):
+            await asyncer.emit((i, "job"), f"j{i}")
+        await asyncer.drain()
+        return asyncer, most
+
+    asyncer, most = asyncio.run(main())
+    assert asyncer.scheduler.workers_for(10) == 4
+    assert asyncer.scheduler.workers_for(3) == 2
+    assert most == 2
+
+
+def test_work_queued_past_its_deadline_goes_to_the_fallback():
+    async def main():
+        asyncer = Asynchronise(workers=1)
+        ran, fell_back = [], []
+
+        def fallback(item):
+            fell_back.append(item)
+
+        @asyncer.collect({"item": (None, "item", None)}, deadline=0.005, fallback=fallback)
+        async def slow(item):
+            ran.append(item)
+            await asyncio.sleep(0.02)
+
+        for i in range(3):
+            await asyncer.emit((i, "item"), f"i{i}")
+        await asyncer.drain()
+        return ran, fell_back
+
+    ran, fell_back = asyncio.run(main())
+    assert ran == [0]
+    assert sorted(fell_back) == [1, 2]
@@ -0,0 +1,49 @@
+import asyncio
+import os
+
+from asynchronise.asynchronise import Asynchronise
+from asynchronise.sharding import ShardedAsynchronise, shard_of
+
+
+def build() -> Asynchronise:
+    asyncer = Asynchronise()
+
+    @asyncer.send
+    @asyncer.collect({"x": (int, "x", None), "y": (int, "y", None)})
+    def add(x, y):
+        return (x + y, os.getpid()), "sum"
+
+    return asyncer
+
+
+def test_shard_of_is_stable_and_in_range():
+    uuids = [f"{i:032x}" for i in range(200)]
+    shards = [shard_of(uu, 3) for uu in uuids]
+    assert shards == [shard_of(uu, 3) for uu in uuids]
+    assert set(shards) == {0, 1, 2}
+
+
+def test_events_sharing_a_uuid_are_collected_on_one_shard():
+    async def main():
+        sharded = ShardedAsynchronise(build, shards=3, forward={"sum"})
+
+        @sharded.send
+        async def pair(i):
+            yield i, "x"
+            yield i * 10, "y"
+
+        async with sharded:
+            for i in range(20):
+                async for _ in pair(i):
+                    pass
+        return [event async for event in sharded.results()], sharded.errors
+
+    results, errors = asyncio.run(main())
+    assert errors == []
+    assert sorted(event.data[0] for event in results) == [11 * i for i in range(20)]
+    # Every shard only ever saw the uuids it owns.
+    pids = {}
+    for event in results:
+        pids.setdefault(shard_of(event.uuid, 3), set()).add(event.data[1])
+    assert all(len(found) == 1 for found in pids.values())
+    assert len(set.union(*pids.values())) == len(pids)
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+from asynchronise.asynchronise import Asynchronise
+from asynchronise.tracing import Span, Tracer
+
+
+def span(tracer, id, parent, kind, name, start, end, **attrs):
+    recorded = tracer.record(Span("u", id, parent, kind, name, start))
+    recorded.end = end
+    recorded.attrs.update(attrs)
+    return recorded
+
+
+def folded(tracer):
+    return dict(line.rsplit(" ", 1) for line in tracer.to_folded().splitlines())
+
+
+def test_nested_completions_only_count_once():
+    tracer = Tracer(sample_rate=1.0)
+    span(tracer, 1, None, "event", "a", 0.0, 0.0)
+    span(tracer, 2, 1, "completion", "stage", 0.0, 0.010, collection_wait=0.001)
+    span(tracer, 3, 2, "event", "b", 0.002, 0.002)
+    # Ran inside stage (eager mode), so its 4ms aren't stage's.
+    span(tracer, 4, 3, "completion", "join", 0.003, 0.007, collection_wait=0.0005)
+    assert folded(tracer) == {
+        "emit a;[collection wait: stage]": "1000",
+        "emit a;stage": "6000",
+        "emit a;stage;emit b;[collection wait: join]": "500",
+        "emit a;stage;emit b;join": "4000",
+    }
+
+
+def test_queued_time_is_split_out():
+    tracer = Tracer(sample_rate=1.0)
+    span(tracer, 1, None, "event", "a", 0.0, 0.0)
+    span(tracer, 2, 1, "completion", "render", 0.0, 0.005, queue_seconds=0.002)
+    assert folded(tracer) == {"emit a;render": "3000", "emit a;render;[queued]": "2000"}
+
+
+def test_a_sampled_uuid_is_traced_end_to_end():
+    async def main():
+        tracer = Tracer(sample_rate=1.0)
+        asyncer = Asynchronise(tracer=tracer, eager=True)
+
+        @asyncer.send
+        @asyncer.collect({"a": (None, "a", None)})
+        async def stage(a):
+            return a, "b"
+
+        @asyncer.collect({"b": (None, "b", None)})
+        async def sink(b):
+            pass
+
+        await asyncer.emit((1, "a"), "u")
+        await asyncer.drain()
+        return tracer
+
+    tracer = asyncio.run(main())
+    assert [(span.kind, span.name) for span in tracer.spans("u")] == [
+        ("event", "a"),
+        ("completion", "stage"),
+        ("event", "b"),
+        ("completion", "sink"),
+    ]
+    names = {event["name"] for event in json.loads(tracer.to_chrome())["traceEvents"]}
+    assert {"a", "stage", "b", "sink"} <= names
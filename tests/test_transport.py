@@ -0,0 +1,145 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from asynchronise.asynchronise import Asynchronise
+from asynchronise.transport import PayloadArena, SharedPayload, detach, resolve
+
+
+@pytest.fixture
+def arena():
+    arena = PayloadArena(threshold=16)
+    yield arena
+    arena.close()
+
+
+def test_small_and_unbufferable_objects_pass_through(arena):
+    assert arena.put(b"tiny") == b"tiny"
+    assert arena.put("not a buffer" * 10) == "not a buffer" * 10
+
+
+def test_put_and_resolve_round_trip(arena):
+    handle = arena.put(bytes(range(64)))
+    assert isinstance(handle, SharedPayload)
+    view = resolve(handle)
+    assert view.tobytes() == bytes(range(64))
+    view.release()
+    detach(handle)
+    arena.release(handle)
+    assert arena.segments == {}
+
+
+def test_the_same_bytes_are_shared_once(arena):
+    data = bytes(64)
+    first, second = arena.put(data), arena.put(data)
+    assert first.name == second.name
+    arena.release(first)
+    assert first.name in arena.segments
+    arena.release(second)
+    assert arena.segments == {}
+
+
+def test_a_refilled_bytearray_is_copied_again(arena):
+    buffer = bytearray(b"a" * 64)
+    first = arena.put(buffer)
+    buffer[:] = b"b" * 64
+    second = arena.put(buffer)
+    assert first.name != second.name
+    for handle, expected in ((first, b"a" * 64), (second, b"b" * 64)):
+        view = resolve(handle)
+        assert view.tobytes() == expected
+        view.release()
+        detach(handle)
+
+
+def test_a_refilled_ndarray_is_copied_again(arena):
+    numpy = pytest.importorskip("numpy")
+    array = numpy.zeros(16, dtype="int64")
+    first = arena.put(array)
+    array[:] = 7
+    second = arena.put(array)
+    assert (resolve(first) == 0).all()
+    assert (resolve(second) == 7).all()
+    detach(first)
+    detach(second)
+
+
+def total(data):
+    return sum(data), "total"
+
+
+def test_process_pool_collectors_get_shared_arguments():
+    async def main():
+        arena = PayloadArena(threshold=16)
+        asyncer = Asynchronise(transport=arena)
+        results = []
+        asyncer.send(asyncer.collect({"data": (bytes, "data", None)}, executor="processes")(total))
+
+        @asyncer.collect({"total": (int, "total", None)})
+        def record(total):
+            results.append(total)
+
+        with ProcessPoolExecutor(1) as pool:
+            asyncer.executors["processes"] = pool
+            await asyncer.emit((bytes(range(100)), "data"), "a")
+            await asyncer.drain()
+        return results, arena.segments
+
+    results, segments = asyncio.run(main())
+    assert results == [4950]
+    assert segments == {}
+
+
+def length(data):
+    return len(data), "length"
+
+
+def first(data):
+    return data[0], "first"
+
+
+def last(data):
+    return data[-1], "last"
+
+
+class CountingArena(PayloadArena):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.placed = set()
+
+    def put(self, obj):
+        handle = super().put(obj)
+        if isinstance(handle, SharedPayload):
+            self.placed.add(handle.name)
+        return handle
+
+
+@pytest.mark.parametrize("eager", [False, True])
+def test_an_event_is_placed_once_for_all_its_process_pool_collectors(eager):
+    async def main():
+        arena = CountingArena(threshold=16)
+        asyncer = Asynchronise(transport=arena, eager=eager)
+        results = {}
+        for func in (length, first, last):
+            asyncer.send(asyncer.collect({"data": (bytearray, "data", None)}, executor="processes")(func))
+
+        @asyncer.collect({"length": (int, "length", None), "first": (int, "first", None), "last": (int, "last", None)})
+        def record(length, first, last):
+            results[first] = (length, last)
+
+        buffer = bytearray(b"\x01" * (1 << 20))
+        with ProcessPoolExecutor(2) as pool:
+            asyncer.executors["processes"] = pool
+            await asyncer.emit((buffer, "data"), "a")
+            await asyncer.drain()
+            # Refilled and sent again: this event gets its own copy.
+            buffer[0] = buffer[-1] = 2
+            await asyncer.emit((buffer, "data"), "b")
+            await asyncer.drain()
+        return results, arena
+
+    results, arena = asyncio.run(main())
+    assert results == {1: (1 << 20, 1), 2: (1 << 20, 2)}
+    assert len(arena.placed) == 2
+    assert arena.segments == {}